@@ -7,6 +7,8 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from blog_app.users.models import User
 from blog_app.posts.models import Post
 from blog_app.comments.models import Comment
+from blog_app.notifications.models import OutboxMessage
+from blog_app.stats.models import UserStats
 from database import Base
 from alembic import context
 
@@ -0,0 +1,34 @@
+"""Add comment counters to posts
+
+Revision ID: 1b6f4c8e2a90
+Revises: e7a3d9c2f815
+Create Date: 2026-10-18 14:05:33.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1b6f4c8e2a90'
+down_revision: Union[str, None] = 'e7a3d9c2f815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('posts', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('posts', sa.Column('last_comment_at', sa.DateTime(), nullable=True))
+    # Backfill from the existing comments
+    op.execute(
+        "UPDATE posts SET "
+        "comment_count = (SELECT count(*) FROM comments WHERE comments.post_id = posts.id), "
+        "last_comment_at = (SELECT max(created_at) FROM comments WHERE comments.post_id = posts.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('posts', 'last_comment_at')
+    op.drop_column('posts', 'comment_count')
@@ -0,0 +1,42 @@
+"""timestamptz created_at with server default
+
+Revision ID: 5e2d7f1a9c34
+Revises: 1b6f4c8e2a90
+Create Date: 2026-10-18 16:20:11.538904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2d7f1a9c34'
+down_revision: Union[str, None] = '1b6f4c8e2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing values were written as naive UTC
+    for table in ('posts', 'comments'):
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(), type_=sa.DateTime(timezone=True),
+                        postgresql_using="created_at AT TIME ZONE 'UTC'")
+        op.execute(f"UPDATE {table} SET created_at = now() WHERE created_at IS NULL")
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(timezone=True),
+                        nullable=False, server_default=sa.text('now()'))
+    op.alter_column('posts', 'last_comment_at', existing_type=sa.DateTime(), type_=sa.DateTime(timezone=True),
+                    postgresql_using="last_comment_at AT TIME ZONE 'UTC'")
+    # (user_id, created_at) on posts and (post_id, created_at) on comments are
+    # covered by the existing (..., created_at, id) keyset indexes
+    op.create_index('ix_comments_user_id_created_at_id', 'comments', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_user_id_created_at_id', table_name='comments')
+    op.alter_column('posts', 'last_comment_at', existing_type=sa.DateTime(timezone=True), type_=sa.DateTime(),
+                    postgresql_using="last_comment_at AT TIME ZONE 'UTC'")
+    for table in ('posts', 'comments'):
+        op.alter_column(table, 'created_at', existing_type=sa.DateTime(timezone=True), type_=sa.DateTime(),
+                        nullable=True, server_default=None, postgresql_using="created_at AT TIME ZONE 'UTC'")
@@ -0,0 +1,26 @@
+"""Add comments post_id index
+
+Revision ID: 8d2e5b41c7f0
+Revises: 3f1c9a7d2e4b
+Create Date: 2026-10-18 10:03:17.264391
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d2e5b41c7f0'
+down_revision: Union[str, None] = '3f1c9a7d2e4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_comments_post_id_created_at_id', 'comments', ['post_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_post_id_created_at_id', table_name='comments')
@@ -0,0 +1,49 @@
+"""cascade comment deletes and comments archive table
+
+Revision ID: a4c8e1f7b352
+Revises: 5e2d7f1a9c34
+Create Date: 2026-10-18 17:05:42.118364
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4c8e1f7b352'
+down_revision: Union[str, None] = '5e2d7f1a9c34'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Deleting a post removes its comments in the database instead of failing on the foreign key
+    op.drop_constraint('comments_post_id_fkey', 'comments', type_='foreignkey')
+    op.create_foreign_key('comments_post_id_fkey', 'comments', 'posts', ['post_id'], ['id'], ondelete='CASCADE')
+
+    op.create_table('comments_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('content', sa.String(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('archived_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_comments_archive_post_id_created_at_id', 'comments_archive', ['post_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    # Archived comments go back to the hot table first
+    op.execute(
+        "INSERT INTO comments (id, user_id, post_id, content, created_at) "
+        "SELECT id, user_id, post_id, content, created_at FROM comments_archive"
+    )
+    op.drop_index('ix_comments_archive_post_id_created_at_id', table_name='comments_archive')
+    op.drop_table('comments_archive')
+    op.drop_constraint('comments_post_id_fkey', 'comments', type_='foreignkey')
+    op.create_foreign_key('comments_post_id_fkey', 'comments', 'posts', ['post_id'], ['id'])
@@ -0,0 +1,56 @@
+"""Added summary tables for user stats and trending posts
+
+Revision ID: d93b6f2e1a47
+Revises: a4c8e1f7b352
+Create Date: 2026-10-18 18:12:09.402715
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93b6f2e1a47'
+down_revision: Union[str, None] = 'a4c8e1f7b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_count', sa.Integer(), nullable=False),
+    sa.Column('comment_count', sa.Integer(), nullable=False),
+    sa.Column('comments_received', sa.Integer(), nullable=False),
+    sa.Column('last_post_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('last_comment_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_table('trending_posts',
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('recent_comments', sa.Integer(), nullable=False),
+    sa.Column('last_comment_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.ForeignKeyConstraint(['post_id'], ['posts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('post_id')
+    )
+    op.create_index('ix_trending_posts_recent_comments_post_id', 'trending_posts', ['recent_comments', 'post_id'], unique=False)
+    op.create_table('summary_refreshes',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Per-user comment counts include archived comments
+    op.create_index('ix_comments_archive_user_id', 'comments_archive', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_comments_archive_user_id', table_name='comments_archive')
+    op.drop_table('summary_refreshes')
+    op.drop_index('ix_trending_posts_recent_comments_post_id', table_name='trending_posts')
+    op.drop_table('trending_posts')
+    op.drop_table('user_stats')
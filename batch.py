@@ -0,0 +1,71 @@
+from fastapi import HTTPException, status
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from typing import Any, Dict, List, Tuple
+
+# Largest number of items accepted by the batch endpoints
+MAX_BATCH_SIZE = 500
+
+# Rows deleted per transaction by the bulk delete endpoints
+PURGE_BATCH_SIZE = 1000
+MAX_PURGE_BATCH_SIZE = 10000
+
+
+class BatchError(BaseModel):
+    index: int
+    detail: Any
+
+
+class BatchDelete(BaseModel):
+    ids: List[int]
+
+
+class BatchDeleteResult(BaseModel):
+    deleted: List[int]
+    errors: List[BatchError]
+
+
+class PurgeResult(BaseModel):
+    deleted: int
+    batches: int
+
+
+def check_batch_size(items: list) -> None:
+    if not items:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch is empty")
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BATCH_SIZE} items per batch"
+        )
+
+
+# Validates every item on its own so one bad item does not reject the whole batch
+def validate_items(items: List[Dict[str, Any]], schema) -> Tuple[List[Tuple[int, Any]], List[BatchError]]:
+    check_batch_size(items)
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, schema.model_validate(item)))
+        except ValidationError as exc:
+            errors.append(BatchError(index=index, detail=exc.errors(include_url=False, include_context=False)))
+    return valid, errors
+
+
+# Deletes every row matching the conditions, oldest first, batch_size rows per
+# transaction: locks are held briefly and no transaction grows with the table.
+# Child rows go with them through ON DELETE CASCADE.
+async def purge_in_batches(db: AsyncSession, model, conditions: list, batch_size: int) -> dict:
+    deleted = batches = 0
+    while True:
+        ids = select(model.id).filter(*conditions).order_by(model.created_at, model.id).limit(batch_size)
+        result = await db.execute(delete(model).where(model.id.in_(ids.scalar_subquery())).returning(model.id))
+        count = len(result.all())
+        await db.commit()
+        if not count:
+            return {"deleted": deleted, "batches": batches}
+        deleted += count
+        batches += 1
+        if count < batch_size:
+            return {"deleted": deleted, "batches": batches}
@@ -0,0 +1,243 @@
+"""Benchmark every route of the app against a seeded database.
+
+Seeds users, posts and comments with the app's own models, then drives
+``main.app`` in-process through an ASGI client and reports latency
+percentiles, throughput and database round trips per request for each
+endpoint. Results are written as JSON so runs from different commits can
+be compared with ``--baseline``.
+
+    python -m benchmarks.run --posts 5000 --requests 500 --concurrency 20 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite:///./benchmark.db")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--endpoints", help="comma-separated subset of endpoints to run")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    return parser.parse_args()
+
+
+args = parse_args()
+
+# The app reads its settings at import time
+os.environ["DATABASE_URL"] = args.database_url
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("REDIS_BROKER", "memory://")
+os.environ.setdefault("REDIS_BACKEND", "cache+memory://")
+os.environ.setdefault("OUTBOX_DISPATCHER_ENABLED", "false")
+os.environ.setdefault("DB_SCHEMA_MODE", "skip")  # seed() creates the tables
+# Measure the routes, not the limiters
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("ADMISSION_MAX_IN_FLIGHT", "0")
+
+import httpx
+from sqlalchemy import event, insert
+from blog_app.users.dependencies import create_access_token, hash_password
+from blog_app.users.models import User
+from blog_app.posts.models import Post
+from blog_app.comments.models import Comment
+from blog_app.stats.summaries import refresh_summaries
+from database import AsyncSessionLocal, Base, engine
+from main import app
+
+SEED_BATCH = 1000
+
+
+async def seed(users: int, posts: int, comments: int) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    # One bcrypt hash shared by every seeded user keeps seeding fast
+    hashed_password = hash_password("benchmark")
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed_password, "age": 30}
+            for i in range(1, users + 1)
+        ])
+        for offset in range(0, posts, SEED_BATCH):
+            await session.execute(insert(Post), [
+                {
+                    "user_id": i % users + 1,
+                    "title": f"Post {i} about topic {i % 97}",
+                    "content": f"Benchmark content {i} with words like python fastapi postgres {i % 13}",
+                    "created_at": start + timedelta(seconds=i),
+                }
+                for i in range(offset, min(offset + SEED_BATCH, posts))
+            ])
+        for offset in range(0, comments, SEED_BATCH):
+            await session.execute(insert(Comment), [
+                {
+                    "user_id": i % users + 1,
+                    "post_id": i % posts + 1,
+                    "content": f"Comment {i} on topic {i % 97}",
+                    "created_at": start + timedelta(seconds=posts + i),
+                }
+                for i in range(offset, min(offset + SEED_BATCH, comments))
+            ])
+        await session.commit()
+
+    # So user_stats and trending_posts read the summaries, as after a beat refresh
+    async with engine.connect() as conn:
+        await refresh_summaries(conn, full=True)
+
+
+def endpoints(users: int, posts: int) -> dict:
+    """Maps endpoint names to functions building the i-th request."""
+
+    def auth(i):
+        return {"Authorization": f"Bearer {tokens[i % users]}"}
+
+    tokens = [create_access_token({"sub": f"user{i}"}) for i in range(1, users + 1)]
+    run_id = int(time.time())
+    return {
+        "register": lambda i: ("POST", "/users/register", {"json": {
+            "username": f"bench{run_id}_{i}", "email": f"bench{run_id}_{i}@example.com", "password": "benchmark", "age": 30,
+        }}),
+        "login": lambda i: ("POST", "/users/login", {"json": {"username": f"user{i % users + 1}", "password": "benchmark"}}),
+        "create_post": lambda i: ("POST", "/posts/", {"json": {"title": f"Bench {i}", "content": "benchmark"}, "headers": auth(i)}),
+        "update_post": lambda i: ("PUT", f"/posts/{i % posts + 1}", {"json": {"title": f"Updated {i}"}, "headers": {
+            "Authorization": f"Bearer {tokens[i % posts % users]}"
+        }}),
+        "get_all_posts": lambda i: ("GET", "/posts/", {}),
+        "get_my_posts": lambda i: ("GET", "/posts/my-posts", {"headers": auth(i)}),
+        "get_post": lambda i: ("GET", f"/posts/{i % posts + 1}", {}),
+        "trending_posts": lambda i: ("GET", "/posts/trending", {}),
+        "user_stats": lambda i: ("GET", f"/users/{i % users + 1}/stats", {}),
+        "get_posts_batch": lambda i: ("GET", "/posts/batch", {"params": {"ids": ",".join(str((i + k) % posts + 1) for k in range(10))}}),
+        "search_posts": lambda i: ("GET", "/posts/search", {"params": {"q": f"topic {i % 97}"}}),
+        "create_comment": lambda i: ("POST", "/comments/", {"json": {"post_id": i % posts + 1, "content": "benchmark"}, "headers": auth(i)}),
+        "get_all_comments": lambda i: ("GET", "/comments/all_comments/", {}),
+        # Seeded comment i + 1 belongs to user i % users + 1
+        "update_comment": lambda i: ("PUT", f"/comments/{i + 1}/", {"json": {"content": f"Updated {i}"}, "headers": auth(i)}),
+        "delete_comment": lambda i: ("DELETE", f"/comments/{i + 1}/", {"headers": auth(i)}),
+    }
+
+
+class RoundTrips:
+    """Counts statements and commits sent to the database."""
+
+    def __init__(self, async_engine):
+        self.count = 0
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._count)
+        event.listen(async_engine.sync_engine, "commit", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_endpoint(client: httpx.AsyncClient, build, requests: int, concurrency: int, round_trips: RoundTrips) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    round_trips_before = round_trips.count
+    latencies, errors = [], 0
+
+    async def one(i):
+        nonlocal errors
+        method, path, kwargs = build(i)
+        async with semaphore:
+            started_at = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            latencies.append(time.perf_counter() - started_at)
+        if response.status_code >= 400:
+            errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started_at
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / elapsed, 2),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "round_trips": round((round_trips.count - round_trips_before) / requests, 2),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(results: dict, baseline: dict) -> None:
+    print(f"{'endpoint':<18}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'db trips':>10}{'errors':>8}")
+    for name, result in results.items():
+        line = (
+            f"{name:<18}{result['rps']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}"
+            f"{result['round_trips']:>10}{result['errors']:>8}"
+        )
+        previous = baseline.get(name)
+        if previous:
+            change = (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100 if previous["p95_ms"] else 0.0
+            line += f"   p95 {change:+.1f}% vs baseline"
+            if "round_trips" in previous:
+                line += f", db trips {previous['round_trips']} -> {result['round_trips']}"
+        print(line)
+
+
+async def main() -> None:
+    await seed(args.users, args.posts, args.comments)
+    selected = endpoints(args.users, args.posts)
+    if args.endpoints:
+        selected = {name: selected[name] for name in args.endpoints.split(",")}
+
+    results = {}
+    round_trips = RoundTrips(engine)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name, build in selected.items():
+                results[name] = await run_endpoint(client, build, args.requests, args.concurrency, round_trips)
+    await engine.dispose()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as previous:
+            baseline = json.load(previous)["results"]
+    print_report(results, baseline)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
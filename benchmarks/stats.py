@@ -0,0 +1,135 @@
+"""Compare the summary tables with the live aggregates they replace.
+
+Seeds a database with ``--users``, ``--posts`` and ``--comments`` spread over
+the last 30 days, then times, per read, ``GET /users/{id}/stats`` and
+``GET /posts/trending`` served from the summaries and computed live. It also
+times a full refresh and an incremental one after ``--new-comments`` writes.
+
+    python -m benchmarks.stats --users 1000 --posts 20000 --comments 200000 --repeat 200
+
+Pass ``--database-url`` to run against Postgres; every table in the target
+database is dropped and recreated.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from blog_app.users.models import User
+from blog_app.posts.models import Post
+from blog_app.posts import counters
+from blog_app.comments.models import Comment
+from blog_app.stats import summaries
+from database import Base
+
+SEED_BATCH = 5000
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite+aiosqlite://")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--comments", type=int, default=50000)
+    parser.add_argument("--new-comments", type=int, default=100, help="writes before the incremental refresh")
+    parser.add_argument("--repeat", type=int, default=100, help="reads per path")
+    return parser.parse_args()
+
+
+async def seed(engine, args) -> None:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": "x", "age": 30}
+            for i in range(1, args.users + 1)
+        ])
+        now = datetime.now(timezone.utc)
+        start = now - timedelta(days=30)
+        for offset in range(0, args.posts, SEED_BATCH):
+            await conn.execute(insert(Post), [
+                {"user_id": i % args.users + 1, "title": f"Post {i}", "content": "benchmark", "created_at": start + timedelta(minutes=i % 40000)}
+                for i in range(offset, min(offset + SEED_BATCH, args.posts))
+            ])
+        rng = random.Random(0)
+        for offset in range(0, args.comments, SEED_BATCH):
+            await conn.execute(insert(Comment), [
+                {
+                    "user_id": rng.randint(1, args.users),
+                    # Skewed towards a few posts, so the trending ranking is meaningful
+                    "post_id": min(int(rng.paretovariate(1.2)), args.posts),
+                    "content": "benchmark",
+                    "created_at": now - timedelta(seconds=rng.randint(0, 30 * 86400)),
+                }
+                for _ in range(offset, min(offset + SEED_BATCH, args.comments))
+            ])
+        await conn.execute(counters.recount_comments())
+
+
+async def timed(action) -> float:
+    started_at = time.perf_counter()
+    await action()
+    return time.perf_counter() - started_at
+
+
+async def measure_reads(session_factory, args, fresh: bool) -> dict:
+    # Pushing the refresh time out of the staleness bound makes the same calls go live
+    summaries.STATS_MAX_STALENESS_SECONDS = 1e9 if fresh else -1
+    rng = random.Random(1)
+    user_timings, trending_timings = [], []
+    async with session_factory() as session:
+        for _ in range(args.repeat):
+            user_id = rng.randint(1, args.users)
+            user_timings.append(await timed(lambda: summaries.user_stats(session, user_id)))
+            trending_timings.append(await timed(lambda: summaries.trending_posts(session, 20)))
+        stats = await summaries.user_stats(session, 1)
+        _, _, source = await summaries.trending_posts(session, 20)
+    assert stats["source"] == source == ("summary" if fresh else "live")
+    return {"user_stats": user_timings, "trending": trending_timings}
+
+
+async def run(engine, args) -> None:
+    await seed(engine, args)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async with engine.connect() as conn:
+        full = await timed(lambda: summaries.refresh_summaries(conn, full=True))
+        async with session_factory() as session:
+            session.add_all(
+                Comment(user_id=i % args.users + 1, post_id=i % args.posts + 1, content="new") for i in range(args.new_comments)
+            )
+            await session.commit()
+        incremental = await timed(lambda: summaries.refresh_summaries(conn))
+
+    summary = await measure_reads(session_factory, args, fresh=True)
+    live = await measure_reads(session_factory, args, fresh=False)
+
+    print(f"{'read':<14}{'summary ms':>12}{'live ms':>12}{'speedup':>10}   "
+          f"({args.users} users, {args.posts} posts, {args.comments} comments, {args.repeat} reads)")
+    for name in ("user_stats", "trending"):
+        summary_ms = statistics.mean(summary[name]) * 1000
+        live_ms = statistics.mean(live[name]) * 1000
+        print(f"{name:<14}{summary_ms:>12.2f}{live_ms:>12.2f}{live_ms / summary_ms:>9.1f}x")
+    print(f"\nfull refresh {full * 1000:.0f} ms, incremental refresh after {args.new_comments} comments {incremental * 1000:.0f} ms")
+
+
+async def main() -> None:
+    args = parse_args()
+    engine = create_async_engine(args.database_url)
+    try:
+        await run(engine, args)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
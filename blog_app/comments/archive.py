@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.future import select
+from dotenv import load_dotenv
+from blog_app.comments.models import Comment, CommentArchive
+import os
+
+load_dotenv()
+
+# Comment archival settings
+COMMENT_ARCHIVE_AFTER_DAYS = int(os.getenv('COMMENT_ARCHIVE_AFTER_DAYS', 365))
+COMMENT_ARCHIVE_BATCH_SIZE = int(os.getenv('COMMENT_ARCHIVE_BATCH_SIZE', 5000))
+
+ARCHIVED_COLUMNS = ("id", "user_id", "post_id", "content", "created_at")
+
+
+# Comments created before this are archived; so a post created after it has none in the archive
+def archive_cutoff() -> datetime:
+    return datetime.now(timezone.utc) - timedelta(days=COMMENT_ARCHIVE_AFTER_DAYS)
+
+
+# Moves comments created before the cutoff to comments_archive, one batch per
+# transaction so locks and WAL stay bounded. Batches go oldest first by
+# (created_at, id), which keeps every archived comment older than every live
+# one: a post's comment page can then simply continue into the archive.
+async def archive_comments(conn: AsyncConnection, cutoff: datetime, batch_size: int = COMMENT_ARCHIVE_BATCH_SIZE) -> int:
+    moved = 0
+    while True:
+        result = await conn.execute(
+            select(Comment.id)
+            .filter(Comment.created_at < cutoff)
+            .order_by(Comment.created_at, Comment.id)
+            .limit(batch_size)
+        )
+        ids = result.scalars().all()
+        if not ids:
+            return moved
+        await conn.execute(
+            insert(CommentArchive).from_select(
+                ARCHIVED_COLUMNS,
+                select(*(getattr(Comment, column) for column in ARCHIVED_COLUMNS)).filter(Comment.id.in_(ids)),
+            )
+        )
+        await conn.execute(delete(Comment).where(Comment.id.in_(ids)))
+        await conn.commit()
+        moved += len(ids)
@@ -1,16 +1,53 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, DDL, event, func
 from sqlalchemy.orm import relationship
-from datetime import datetime, timezone
 from database import Base
 
 class Comment(Base):
     __tablename__ = "comments"
+    __table_args__ = (
+        # Keyset pagination indexes for the listing endpoint and post detail
+        Index("ix_comments_created_at_id", "created_at", "id"),
+        Index("ix_comments_post_id_created_at_id", "post_id", "created_at", "id"),
+        Index("ix_comments_user_id_created_at_id", "user_id", "created_at", "id"),
+        # Archived comments keep their ids, so SQLite must not hand out the highest freed id again
+        {"sqlite_autoincrement": True},
+    )
+    # Read created_at back from the INSERT instead of a lazy load later
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    post_id = Column(Integer, ForeignKey("posts.id"), nullable=False)
+    # Deleting a post deletes its comments in the database, without loading them
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
     content = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
 
     user = relationship("User", back_populates="comments")
     post = relationship("Post", back_populates="comments")
+
+# Comments older than COMMENT_ARCHIVE_AFTER_DAYS, moved out of the hot table
+# by the archive_old_comments task (see archive.py)
+class CommentArchive(Base):
+    __tablename__ = "comments_archive"
+    __table_args__ = (
+        Index("ix_comments_archive_post_id_created_at_id", "post_id", "created_at", "id"),
+        Index("ix_comments_archive_user_id", "user_id"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), nullable=False)
+    content = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    user = relationship("User")
+
+# Full-text search vector maintained by Postgres itself (see search.py)
+event.listen(Comment.__table__, "after_create", DDL(
+    "ALTER TABLE comments ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('english', coalesce(content, ''))) STORED"
+).execute_if(dialect="postgresql"))
+event.listen(Comment.__table__, "after_create", DDL(
+    "CREATE INDEX ix_comments_search_vector ON comments USING gin (search_vector)"
+).execute_if(dialect="postgresql"))
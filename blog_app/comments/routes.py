@@ -1,60 +1,86 @@
-from datetime import datetime, timezone
-from fastapi import APIRouter, Depends, HTTPException, status
+from datetime import datetime
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, func, insert, update
 from sqlalchemy.future import select
 from sqlalchemy.orm import joinedload
-from typing import List
+from typing import Any, Dict, List, Optional
 from blog_app.posts.models import Post
-from blog_app.comments.models import Comment
-from blog_app.comments.schemas import CommentCreate, CommentUpdate, CommentResponse
-from blog_app.users.dependencies import verify_access_token, oauth2_scheme
+from blog_app.posts import counters
+from blog_app.comments.models import Comment, CommentArchive
+from blog_app.comments.stream import comment_broker, comment_event
+from blog_app.stats import summaries
+from blog_app.comments.schemas import (
+    CommentCreate, CommentUpdate, CommentBatchUpdate, CommentResponse, CommentPage, CommentBatchResult,
+    CommentSearchPage,
+)
+from blog_app.users.dependencies import get_current_user
 from blog_app.users.models import User
-from database import get_db
+from database import get_db, get_read_db, open_read_session
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FAST_JSON_RESPONSES, paginate, build_page, columns_for, page_json
+from export import ndjson_response
+from cache import response_cache
+from idempotency import idempotency_store
+from search import search
+from ratelimit import rate_limiter
+from batch import BatchDelete, BatchDeleteResult, BatchError, check_batch_size, validate_items
 
 router = APIRouter()
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
-) -> User:
-    payload = verify_access_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token"
-        )
-
-    username = payload.get("sub")
-    result = await db.execute(select(User).filter(User.username == username))
-    user = result.scalars().first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-        )
-    return user
+# Called when an UPDATE/DELETE ... WHERE id AND user_id matched nothing,
+# to tell a missing comment (404) from someone else's (403). Archived
+# comments count as existing: their pages still show them.
+async def raise_not_found_or_forbidden(db: AsyncSession, comment_id: int, action: str, current_user: User):
+    result = await db.execute(select(Comment.id).filter(Comment.id == comment_id))
+    if result.first() is None:
+        result = await db.execute(select(CommentArchive.user_id).filter(CommentArchive.id == comment_id))
+        owner_id = result.scalar()
+        if owner_id is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
+        if owner_id == current_user.id:
+            # Editing would make it newer than live comments (see archive.py)
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Archived comments cannot be {action}d")
+    raise HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN, detail=f"Not authorized to {action} this comment"
+    )
 
 
-@router.post("/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED)
+@router.post(
+    "/", response_model=CommentResponse, status_code=status.HTTP_201_CREATED,
+    dependencies=[rate_limiter.limit("create_comment", "60/minute", key="user")],
+)
 async def create_comment(
     comment: CommentCreate,
+    request: Request,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    # Ensure the post exists
-    result = await db.execute(select(Post).filter(Post.id == comment.post_id))
-    post = result.scalars().first()
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-
-    new_comment = Comment(
-        user_id=current_user.id,
-        post_id=comment.post_id,
-        content=comment.content,
-        created_at=datetime.now(timezone.utc).replace(tzinfo=None)
+    async def execute():
+        # Ensure the post exists and count the comment on it, in one statement
+        result = await db.execute(counters.add_comment(comment.post_id))
+        if result.scalar() is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+
+        # created_at comes from the database clock, read back by the INSERT (eager_defaults)
+        new_comment = Comment(
+            user_id=current_user.id,
+            post_id=comment.post_id,
+            content=comment.content,
+        )
+        db.add(new_comment)
+        await db.flush()
+        # Delivered to live streams once the transaction commits
+        await comment_broker.publish(db, [comment_event("created", new_comment.post_id, new_comment.id, new_comment)])
+        await db.commit()
+        await response_cache.invalidate("comments")
+        await response_cache.invalidate("posts")
+        return new_comment
+
+    # A retry with the same Idempotency-Key gets the first response back
+    return await idempotency_store.respond(
+        request, current_user.id, CommentResponse, execute, status_code=status.HTTP_201_CREATED
     )
-    db.add(new_comment)
-    await db.commit()
-    await db.refresh(new_comment)
-    return new_comment
 
 
 @router.put("/{comment_id}/", response_model=CommentResponse)
@@ -64,22 +90,27 @@ async def update_comment(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    # Ensure the comment exists
-    result = await db.execute(select(Comment).filter(Comment.id == comment_id))
+    # Ownership check and update in one statement
+    result = await db.execute(
+        update(Comment)
+        .where(Comment.id == comment_id, Comment.user_id == current_user.id)
+        .values(content=comment_data.content, created_at=func.now())
+        .returning(Comment)
+    )
     comment = result.scalars().first()
     if not comment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
-
-    # Ensure the user is the owner of the comment
-    if comment.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this comment"
-        )
+        await raise_not_found_or_forbidden(db, comment_id, "update", current_user)
 
-    comment.content = comment_data.content
-    comment.created_at = datetime.now(timezone.utc).replace(tzinfo=None)  # Optional: Update timestamp
+    await db.execute(
+        update(Post)
+        .where(Post.id == comment.post_id)
+        .values(last_comment_at=comment.created_at)
+        .execution_options(synchronize_session=False)
+    )
+    await comment_broker.publish(db, [comment_event("updated", comment.post_id, comment.id, comment)])
     await db.commit()
-    await db.refresh(comment)
+    await response_cache.invalidate("comments")
+    await response_cache.invalidate("posts")
     return comment
 
 
@@ -89,26 +120,198 @@ async def delete_comment(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    # Ensure the comment exists
-    result = await db.execute(select(Comment).filter(Comment.id == comment_id))
-    comment = result.scalars().first()
-    if not comment:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
-
-    # Ensure the user is the owner of the comment
-    if comment.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this comment"
+    # Ownership check and delete in one statement
+    result = await db.execute(
+        delete(Comment)
+        .where(Comment.id == comment_id, Comment.user_id == current_user.id)
+        .returning(Comment.post_id)
+    )
+    post_id = result.scalar()
+    if post_id is None:
+        # Archived comments can still be deleted by their author
+        result = await db.execute(
+            delete(CommentArchive)
+            .where(CommentArchive.id == comment_id, CommentArchive.user_id == current_user.id)
+            .returning(CommentArchive.post_id)
         )
+        post_id = result.scalar()
+    if post_id is None:
+        await raise_not_found_or_forbidden(db, comment_id, "delete", current_user)
 
-    await db.delete(comment)
+    await db.execute(counters.recount_comments([post_id]))
+    await summaries.forget_comments(db, current_user.id, [post_id])
+    await comment_broker.publish(db, [comment_event("deleted", post_id, comment_id)])
     await db.commit()
+    await response_cache.invalidate("comments")
+    await response_cache.invalidate("posts")
     return
 
-@router.get("/all_comments/", response_model=List[CommentResponse])
-async def get_all_comments(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(Comment))
-    comments = result.scalars().all()
-    if not comments:
-        raise HTTPException(status_code=404, detail="No comments found")
-    return comments
+@router.get("/all_comments/", response_model=CommentPage)
+async def get_all_comments(
+    request: Request,
+    post_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    async def load():
+        if FAST_JSON_RESPONSES:
+            query = select(*columns_for(Comment, CommentResponse))
+        else:
+            query = select(Comment)
+        if post_id is not None:
+            query = query.filter(Comment.post_id == post_id)
+        # Opened on a cache miss only, so a hit costs no connection checkout
+        async with await open_read_session(request.headers.get("authorization")) as db:
+            result = await db.execute(paginate(query, Comment, cursor, limit, since, until))
+            comments = result.all() if FAST_JSON_RESPONSES else result.scalars().all()
+        if not comments and not cursor and post_id is None and since is None and until is None:
+            raise HTTPException(status_code=404, detail="No comments found")
+        if FAST_JSON_RESPONSES:
+            return page_json(comments, limit)
+        return CommentPage.model_validate(build_page(comments, limit), from_attributes=True).model_dump_json()
+
+    return await response_cache.respond(request, "comments", load)
+
+
+@router.get("/search", response_model=CommentSearchPage)
+async def search_comments(
+    q: str = Query(..., min_length=1),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Ranked full-text search over comment content
+    rows, next_cursor = await search(db, Comment, q, cursor, limit)
+    items = [
+        {**CommentResponse.model_validate(comment, from_attributes=True).model_dump(), "rank": rank}
+        for comment, rank in rows
+    ]
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/export")
+async def export_comments(format: str = Query("ndjson", pattern="^ndjson$")):
+    # Stream every comment as NDJSON without building the full list in memory:
+    # live comments by id, then archived ones by id
+    queries = [select(Comment).order_by(Comment.id), select(CommentArchive).order_by(CommentArchive.id)]
+    return ndjson_response(queries, CommentResponse, "comments")
+
+
+@router.post("/batch", response_model=CommentBatchResult, status_code=status.HTTP_201_CREATED, dependencies=[rate_limiter.limit("batch_write", "10/minute", key="user")])
+async def create_comments_batch(
+    items: List[Dict[str, Any]] = Body(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    valid, errors = validate_items(items, CommentCreate)
+
+    # Ensure the posts exist, with one query for the whole batch
+    result = await db.execute(select(Post.id).filter(Post.id.in_([comment.post_id for _, comment in valid])))
+    post_ids = set(result.scalars().all())
+    rows = []
+    for index, comment in valid:
+        if comment.post_id not in post_ids:
+            errors.append(BatchError(index=index, detail="Post not found"))
+            continue
+        rows.append({
+            "user_id": current_user.id,
+            "post_id": comment.post_id,
+            "content": comment.content,
+        })
+
+    comments = []
+    if rows:
+        result = await db.scalars(insert(Comment).returning(Comment, sort_by_parameter_order=True), rows)
+        comments = result.all()
+        await db.execute(counters.recount_comments({row["post_id"] for row in rows}))
+        await comment_broker.publish(
+            db, [comment_event("created", comment.post_id, comment.id, comment) for comment in comments]
+        )
+        await db.commit()
+        await response_cache.invalidate("comments")
+        await response_cache.invalidate("posts")
+
+    errors.sort(key=lambda error: error.index)
+    return {"items": comments, "errors": errors}
+
+
+@router.put("/batch", response_model=CommentBatchResult, dependencies=[rate_limiter.limit("batch_write", "10/minute", key="user")])
+async def update_comments_batch(
+    items: List[Dict[str, Any]] = Body(...),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    valid, errors = validate_items(items, CommentBatchUpdate)
+
+    # Ensure the user is the owner of every comment
+    result = await db.execute(
+        select(Comment.id).filter(Comment.id.in_([comment.id for _, comment in valid]), Comment.user_id == current_user.id)
+    )
+    owned = set(result.scalars().all())
+    changes = []
+    for index, comment in valid:
+        if comment.id not in owned:
+            errors.append(BatchError(index=index, detail="Comment not found or not authorized"))
+            continue
+        changes.append({
+            "id": comment.id,
+            "content": comment.content,
+        })
+
+    comments = []
+    if changes:
+        # ORM bulk UPDATE by primary key
+        await db.execute(update(Comment).values(created_at=func.now()), changes)
+        result = await db.execute(select(Comment).filter(Comment.id.in_([change["id"] for change in changes])))
+        comments = result.scalars().all()
+        await db.execute(counters.recount_comments({comment.post_id for comment in comments}))
+        await comment_broker.publish(
+            db, [comment_event("updated", comment.post_id, comment.id, comment) for comment in comments]
+        )
+        await db.commit()
+        await response_cache.invalidate("comments")
+        await response_cache.invalidate("posts")
+
+    errors.sort(key=lambda error: error.index)
+    return {"items": comments, "errors": errors}
+
+
+@router.delete("/batch", response_model=BatchDeleteResult, dependencies=[rate_limiter.limit("batch_write", "10/minute", key="user")])
+async def delete_comments_batch(
+    batch: BatchDelete,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    check_batch_size(batch.ids)
+    result = await db.execute(
+        delete(Comment)
+        .where(Comment.id.in_(batch.ids), Comment.user_id == current_user.id)
+        .returning(Comment.id, Comment.post_id)
+    )
+    rows = result.all()
+    archived_ids = set(batch.ids) - {comment_id for comment_id, _ in rows}
+    if archived_ids:
+        # The rest may have been archived
+        result = await db.execute(
+            delete(CommentArchive)
+            .where(CommentArchive.id.in_(archived_ids), CommentArchive.user_id == current_user.id)
+            .returning(CommentArchive.id, CommentArchive.post_id)
+        )
+        rows += result.all()
+    deleted = {comment_id for comment_id, _ in rows}
+    await db.execute(counters.recount_comments({post_id for _, post_id in rows}))
+    if rows:
+        await summaries.forget_comments(db, current_user.id, {post_id for _, post_id in rows})
+    await comment_broker.publish(db, [comment_event("deleted", post_id, comment_id) for comment_id, post_id in rows])
+    await db.commit()
+    await response_cache.invalidate("comments")
+    await response_cache.invalidate("posts")
+
+    errors = [
+        BatchError(index=index, detail="Comment not found or not authorized")
+        for index, comment_id in enumerate(batch.ids)
+        if comment_id not in deleted
+    ]
+    return {"deleted": sorted(deleted), "errors": errors}
@@ -1,5 +1,8 @@
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
+from blog_app.users.schemas import AuthorSummary
+from batch import BatchError
 
 
 class CommentBase(BaseModel):
@@ -15,6 +18,11 @@ class CommentUpdate(CommentBase):
     pass
 
 
+class CommentBatchUpdate(CommentBase):
+    """Schema for one item of a batch comment update."""
+    id: int
+
+
 class CommentResponse(BaseModel):
     """Schema for returning a comment in response."""
     id: int
@@ -25,3 +33,31 @@ class CommentResponse(BaseModel):
 
     class Config:
         orm_mode = True  # Enables automatic conversion of ORM objects to Pydantic models
+
+
+class CommentDetail(CommentResponse):
+    """Schema for returning a comment together with its author."""
+    user: AuthorSummary
+
+
+class CommentPage(BaseModel):
+    """Schema for returning a page of comments with the cursor of the next page."""
+    items: List[CommentResponse]
+    next_cursor: Optional[str] = None
+
+
+class CommentBatchResult(BaseModel):
+    """Schema for returning the outcome of a batch of comment changes."""
+    items: List[CommentResponse]
+    errors: List[BatchError]
+
+
+class CommentSearchResult(CommentResponse):
+    """Schema for returning a comment matched by a search with its rank."""
+    rank: float
+
+
+class CommentSearchPage(BaseModel):
+    """Schema for returning a page of ranked search results."""
+    items: List[CommentSearchResult]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,205 @@
+from collections import defaultdict
+from fastapi import HTTPException, Request, status
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from sqlalchemy.future import select
+from dotenv import load_dotenv
+from blog_app.comments.models import Comment
+from blog_app.comments.schemas import CommentResponse
+from database import AsyncSessionLocal, engine
+import asyncio
+import json
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Live comment stream settings
+COMMENT_CHANNEL = "comment_events"
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', 100))
+STREAM_MAX_SUBSCRIBERS = int(os.getenv('STREAM_MAX_SUBSCRIBERS', 10000))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 15))
+STREAM_RECONNECT_SECONDS = float(os.getenv('STREAM_RECONNECT_SECONDS', 2))
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+def comment_event(kind: str, post_id: int, comment_id: int, comment=None) -> dict:
+    message = {"event": kind, "post_id": post_id, "comment_id": comment_id}
+    if comment is not None:
+        message["comment"] = CommentResponse.model_validate(comment, from_attributes=True).model_dump(mode="json")
+    return message
+
+
+class CommentBroker:
+    """Fans comment events out to this worker's SSE subscribers.
+
+    On Postgres, writers NOTIFY inside their transaction and a single LISTEN
+    connection per worker receives every committed event, however many
+    streams are open. Each subscriber has a bounded queue; one that falls
+    that far behind is evicted instead of buffering without limit. Other
+    databases have no LISTEN, so events are delivered in-process after commit,
+    which only reaches subscribers of the same worker.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.queues = defaultdict(set)  # post id -> subscriber queues
+        self.subscribers = 0
+        self.delivered = 0
+        self.evicted = 0
+        self._listener = None
+
+    # Writers
+
+    async def publish(self, db: AsyncSession, events: list) -> None:
+        """Queues events for delivery when the caller's transaction commits."""
+        if not events:
+            return
+        if db.get_bind().dialect.name != "postgresql":
+            db.info.setdefault("comment_events", []).extend(events)
+            return
+        payloads = []
+        for message in events:
+            payload = json.dumps(message)
+            if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+                # Too long to carry the comment: listeners load it themselves
+                payload = json.dumps({key: value for key, value in message.items() if key != "comment"})
+            payloads.append({"channel": COMMENT_CHANNEL, "payload": payload})
+        # NOTIFY is transactional: nothing is delivered if the write rolls back
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"), payloads)
+
+    # Subscribers
+
+    def check_capacity(self) -> None:
+        if self.subscribers >= self.max_subscribers:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many open comment streams, retry later",
+                headers={"Retry-After": "5"},
+            )
+
+    async def stream(self, request: Request, post_id: int):
+        queue = asyncio.Queue(self.queue_size)
+        self.queues[post_id].add(queue)
+        self.subscribers += 1
+        self._ensure_listener()
+        try:
+            yield f"retry: {int(STREAM_RECONNECT_SECONDS * 1000)}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {message['event']}\ndata: {json.dumps(message)}\n\n"
+                if message["event"] == "evicted":
+                    break
+        finally:
+            self.queues[post_id].discard(queue)
+            if not self.queues[post_id]:
+                del self.queues[post_id]
+            self.subscribers -= 1
+
+    def dispatch(self, message: dict) -> None:
+        for queue in list(self.queues.get(message["post_id"], ())):
+            try:
+                queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self._evict(message["post_id"], queue)
+
+    def _evict(self, post_id: int, queue: asyncio.Queue) -> None:
+        # Drop the backlog and tell the client to reload and reconnect. The queue leaves the
+        # post first, so later events can neither evict it again nor push out the marker
+        self.evicted += 1
+        self.queues[post_id].discard(queue)
+        if not self.queues[post_id]:
+            del self.queues[post_id]
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"event": "evicted", "detail": "Too slow to keep up with the stream"})
+
+    def _broadcast(self, message: dict) -> None:
+        for post_id in list(self.queues):
+            self.dispatch(dict(message, post_id=post_id))
+
+    # Listener
+
+    def _ensure_listener(self) -> None:
+        # Started on the first subscriber, so workers without streams hold no extra connection
+        if engine.dialect.name == "postgresql" and (self._listener is None or self._listener.done()):
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    async def _listen(self) -> None:
+        reconnecting = False
+        while True:
+            # Its own connection outside the pool, held for as long as the worker lives
+            listen_engine = create_async_engine(engine.url, poolclass=NullPool)
+            try:
+                async with listen_engine.connect() as conn:
+                    connection = (await conn.get_raw_connection()).driver_connection
+                    lost = asyncio.Event()
+                    connection.add_termination_listener(lambda _: lost.set())
+                    await connection.add_listener(COMMENT_CHANNEL, self._on_notify)
+                    if reconnecting:
+                        # Events committed while not listening were missed
+                        self._broadcast({"event": "resync", "comment_id": None})
+                    await lost.wait()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Comment stream listener lost its connection", exc_info=True)
+            finally:
+                await listen_engine.dispose()
+            reconnecting = True
+            await asyncio.sleep(STREAM_RECONNECT_SECONDS)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        message = json.loads(payload)
+        if message["event"] != "deleted" and "comment" not in message:
+            asyncio.get_running_loop().create_task(self._load_and_dispatch(message))
+        else:
+            self.dispatch(message)
+
+    async def _load_and_dispatch(self, message: dict) -> None:
+        # Once per worker, not once per subscriber
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Comment).filter(Comment.id == message["comment_id"]))
+            comment = result.scalars().first()
+        if comment is not None:
+            self.dispatch(comment_event(message["event"], message["post_id"], comment.id, comment))
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {"subscribers": self.subscribers, "delivered": self.delivered, "evicted": self.evicted}
+
+
+comment_broker = CommentBroker(STREAM_QUEUE_SIZE, STREAM_MAX_SUBSCRIBERS)
+
+
+# In-process delivery for databases without LISTEN/NOTIFY
+@event.listens_for(Session, "after_commit")
+def _deliver_committed(session):
+    for message in session.info.pop("comment_events", ()):
+        comment_broker.dispatch(message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rolled_back(session):
+    session.info.pop("comment_events", None)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+from database import Base
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # The dispatcher polls for due messages in id order
+        Index("ix_outbox_next_attempt_at_id", "next_attempt_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    task = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False)
@@ -0,0 +1,110 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete
+from sqlalchemy.future import select
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+from blog_app.notifications.models import OutboxMessage
+from database import AsyncSessionLocal
+from metrics import CELERY_ENQUEUE_LATENCY
+import asyncio
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Outbox dispatcher settings
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', 1))
+OUTBOX_RETRY_BASE_SECONDS = float(os.getenv('OUTBOX_RETRY_BASE_SECONDS', 2))
+OUTBOX_RETRY_MAX_SECONDS = float(os.getenv('OUTBOX_RETRY_MAX_SECONDS', 300))
+# Emails per send_email_batch task, sent over one SMTP connection
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))
+
+# Name of celery_app_worker.send_email, without importing Celery
+SEND_EMAIL_TASK = "celery_app_worker.send_email"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Adds an email to the outbox; it is committed together with the caller's transaction
+def enqueue_email(db: AsyncSession, subject: str, recipient: str, body: str) -> None:
+    now = _now()
+    db.add(OutboxMessage(
+        task=SEND_EMAIL_TASK,
+        payload={"subject": subject, "recipient": recipient, "body": body},
+        attempts=0,
+        next_attempt_at=now,
+        created_at=now,
+    ))
+
+
+def _publish(messages) -> None:
+    # Celery is imported on first publish rather than at app startup, where it
+    # is the slowest import; the broker connection is opened lazily by Celery
+    from celery import group
+    from celery_app_worker import celery_app, send_email_batch
+
+    emails = [message.payload for message in messages if message.task == SEND_EMAIL_TASK]
+    signatures = [
+        send_email_batch.s(emails[start:start + EMAIL_BATCH_SIZE]) for start in range(0, len(emails), EMAIL_BATCH_SIZE)
+    ]
+    signatures += [
+        celery_app.signature(message.task, kwargs=message.payload) for message in messages if message.task != SEND_EMAIL_TASK
+    ]
+    # One group publishes the whole batch over a single broker connection
+    group(signatures).apply_async()
+
+
+async def dispatch_batch() -> int:
+    async with AsyncSessionLocal() as session:
+        # SKIP LOCKED lets several workers drain the outbox without sending twice
+        result = await session.execute(
+            select(OutboxMessage)
+            .filter(OutboxMessage.next_attempt_at <= _now())
+            .order_by(OutboxMessage.id)
+            .limit(OUTBOX_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        messages = result.scalars().all()
+        if not messages:
+            return 0
+
+        try:
+            with CELERY_ENQUEUE_LATENCY.time():
+                await asyncio.to_thread(_publish, messages)
+        except Exception:
+            logger.warning("Could not publish %d outbox messages, will retry", len(messages), exc_info=True)
+            for message in messages:
+                message.attempts += 1
+                delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (message.attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+                message.next_attempt_at = _now() + timedelta(seconds=delay)
+            await session.commit()
+            return 0
+
+        await session.execute(
+            delete(OutboxMessage).where(OutboxMessage.id.in_([message.id for message in messages]))
+        )
+        await session.commit()
+        return len(messages)
+
+
+async def run_dispatcher() -> None:
+    while True:
+        try:
+            # Keep draining while full batches come back, then wait for new messages
+            while await dispatch_batch() == OUTBOX_BATCH_SIZE:
+                pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Outbox dispatcher failed")
+        await asyncio.sleep(OUTBOX_POLL_INTERVAL)
+
+
+# Standalone dispatcher: python -m blog_app.notifications.outbox
+if __name__ == "__main__":
+    asyncio.run(run_dispatcher())
@@ -0,0 +1,75 @@
+"""Minimal local SMTP server for development and load tests.
+
+Accepts every message and logs its envelope, so send_email and
+send_email_batch can be exercised against a real SMTP conversation:
+
+    python -m blog_app.notifications.smtp_stub --port 1025
+"""
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger("smtp_stub")
+
+
+class StubSMTPServer:
+    def __init__(self):
+        self.connections = 0
+        self.messages = []  # (sender, recipients, data)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(line: str) -> None:
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        sender, recipients = None, []
+        await reply("220 smtp-stub ready")
+        try:
+            while line := await reader.readline():
+                command = line.decode(errors="replace").strip()
+                verb = command[:4].upper()
+                if verb in ("HELO", "EHLO"):
+                    await reply("250 smtp-stub")
+                elif verb == "MAIL":
+                    sender, recipients = command.partition(":")[2].strip(), []
+                    await reply("250 OK")
+                elif verb == "RCPT":
+                    recipients.append(command.partition(":")[2].strip())
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while (line := await reader.readline()) not in (b".\r\n", b".\n", b""):
+                        data.append(line)
+                    self.messages.append((sender, recipients, b"".join(data)))
+                    logger.info("Message %d from %s to %s", len(self.messages), sender, ", ".join(recipients))
+                    await reply("250 OK: queued")
+                elif verb == "RSET":
+                    sender, recipients = None, []
+                    await reply("250 OK")
+                elif verb == "NOOP":
+                    await reply("250 OK")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        logger.info("SMTP stub listening on %s:%d", host, port)
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(StubSMTPServer().serve(args.host, args.port))
@@ -0,0 +1,36 @@
+from sqlalchemy import func, update
+from sqlalchemy.future import select
+from blog_app.posts.models import Post
+from blog_app.comments.models import Comment, CommentArchive
+
+
+# Recomputes comment_count and last_comment_at from the comments table and its
+# archive in a single UPDATE. Used after deletes and batch changes, and by the
+# periodic reconciliation task to repair any drift.
+def recount_comments(post_ids=None):
+    def count(model):
+        return select(func.count(model.id)).where(model.post_id == Post.id).scalar_subquery()
+
+    def latest(model):
+        return select(func.max(model.created_at)).where(model.post_id == Post.id).scalar_subquery()
+
+    statement = update(Post).values(
+        comment_count=count(Comment) + count(CommentArchive),
+        # Archived comments are always older than live ones
+        last_comment_at=func.coalesce(latest(Comment), latest(CommentArchive)),
+    )
+    if post_ids is not None:
+        statement = statement.where(Post.id.in_(post_ids))
+    return statement.execution_options(synchronize_session=False)
+
+
+# Counts one new comment on a post; returns the post id, or nothing when the post does not exist.
+# last_comment_at uses the database clock, like the comment's created_at default.
+def add_comment(post_id: int):
+    return (
+        update(Post)
+        .where(Post.id == post_id)
+        .values(comment_count=Post.comment_count + 1, last_comment_at=func.now())
+        .returning(Post.id)
+        .execution_options(synchronize_session=False)
+    )
@@ -1,16 +1,35 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, DDL, event, func
 from sqlalchemy.orm import relationship
-from datetime import datetime, timezone
 from database import Base
 
 class Post(Base):
     __tablename__ = "posts"
+    __table_args__ = (
+        # Keyset pagination indexes for the listing endpoints
+        Index("ix_posts_created_at_id", "created_at", "id"),
+        Index("ix_posts_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+    # Read created_at back from the INSERT instead of a lazy load later
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     title = Column(String, nullable=False)
     content = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    # Denormalized from comments so feeds need no aggregation (see counters.py)
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_comment_at = Column(DateTime(timezone=True), nullable=True)
 
     user = relationship("User", back_populates="posts")
-    comments = relationship("Comment", back_populates="post")
+    # The database cascades deletes to comments (ON DELETE CASCADE)
+    comments = relationship("Comment", back_populates="post", passive_deletes=True)
+
+# Full-text search vector maintained by Postgres itself (see search.py)
+event.listen(Post.__table__, "after_create", DDL(
+    "ALTER TABLE posts ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('english', coalesce(title, '') || ' ' || coalesce(content, ''))) STORED"
+).execute_if(dialect="postgresql"))
+event.listen(Post.__table__, "after_create", DDL(
+    "CREATE INDEX ix_posts_search_vector ON posts USING gin (search_vector)"
+).execute_if(dialect="postgresql"))
@@ -1,108 +1,391 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import delete, insert, update
 from sqlalchemy.future import select
-from datetime import datetime, timezone
-from typing import List
-from database import get_db
-from blog_app.users.dependencies import verify_access_token, oauth2_scheme
+from sqlalchemy.orm import joinedload
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from database import get_db, get_read_db, open_read_session
+from pagination import (
+    DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, FAST_JSON_RESPONSES, paginate, build_page, first_pages, columns_for, page_json,
+    as_utc, encode_cursor,
+)
+from export import ndjson_response
+from cache import response_cache
+from idempotency import idempotency_store
+from search import search
+from ratelimit import rate_limiter
+from batch import (
+    BatchDelete, BatchDeleteResult, BatchError, PurgeResult, PURGE_BATCH_SIZE, MAX_PURGE_BATCH_SIZE,
+    check_batch_size, purge_in_batches, validate_items,
+)
+from blog_app.users.dependencies import get_admin_user, get_current_user
 from blog_app.posts import models, schemas
 from blog_app.users.models import User
-from celery_app_worker import send_email 
+from blog_app.comments.models import Comment, CommentArchive
+from blog_app.comments.archive import archive_cutoff
+from blog_app.stats import summaries
+from blog_app.comments.stream import comment_broker
+from blog_app.notifications.outbox import enqueue_email
 
 router = APIRouter()
 
-# Helper function to get the current user
-async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
-    payload = verify_access_token(token)
-    if not payload:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
-
-    username = payload.get("sub")
-    result = await db.execute(select(User).filter(User.username == username))
-    user = result.scalars().first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-    return user
-
 # 1. Post a blog (async)
-@router.post("/", response_model=schemas.PostResponse)
+@router.post("/", response_model=schemas.PostResponse, dependencies=[rate_limiter.limit("create_post", "30/minute", key="user")])
 async def create_post(
     post: schemas.PostCreate, 
+    request: Request,
     db: AsyncSession = Depends(get_db), 
     current_user: User = Depends(get_current_user)
 ):
-    created_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    async def execute():
+        # created_at comes from the database clock, read back by the INSERT (eager_defaults)
+        new_post = models.Post(
+            user_id=current_user.id,
+            title=post.title,
+            content=post.content,
+        )
+
+        db.add(new_post)
+        # The email is written to the outbox in the same transaction as the post
+        enqueue_email(
+            db,
+            subject="New Post Created",
+            recipient=current_user.email,
+            body=f"Dear {current_user.username},\nYou created a post titled '{new_post.title}'."
+        )
+        await db.commit()
+        await response_cache.invalidate("posts")
+
+        return new_post
+
+    # A retry with the same Idempotency-Key gets the first response back
+    return await idempotency_store.respond(request, current_user.id, schemas.PostResponse, execute)
+
+# Batch create blogs with one multi-row INSERT ... RETURNING
+@router.post("/batch", response_model=schemas.PostBatchResult, status_code=status.HTTP_201_CREATED, dependencies=[rate_limiter.limit("batch_write", "10/minute", key="user")])
+async def create_posts_batch(
+    items: List[Dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    valid, errors = validate_items(items, schemas.PostCreate)
+    posts = []
+    if valid:
+        result = await db.scalars(
+            insert(models.Post).returning(models.Post, sort_by_parameter_order=True),
+            [{"user_id": current_user.id, "title": post.title, "content": post.content} for _, post in valid],
+        )
+        posts = result.all()
+        # One notification for the whole batch
+        enqueue_email(
+            db,
+            subject="New Posts Created",
+            recipient=current_user.email,
+            body=f"Dear {current_user.username},\nYou created {len(posts)} posts."
+        )
+        await db.commit()
+        await response_cache.invalidate("posts")
 
-    new_post = models.Post(
-        user_id=current_user.id,
-        title=post.title,
-        content=post.content,
-        created_at=created_at
+    return {"items": posts, "errors": errors}
+
+# Batch update blogs owned by the current user
+@router.put("/batch", response_model=schemas.PostBatchResult, dependencies=[rate_limiter.limit("batch_write", "10/minute", key="user")])
+async def update_posts_batch(
+    items: List[Dict[str, Any]] = Body(...),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    valid, errors = validate_items(items, schemas.PostBatchUpdate)
+    result = await db.execute(
+        select(models.Post.id).filter(
+            models.Post.id.in_([post.id for _, post in valid]), models.Post.user_id == current_user.id
+        )
     )
+    owned = set(result.scalars().all())
 
-    db.add(new_post)
-    await db.commit()
-    await db.refresh(new_post)
+    changes = []
+    for index, post in valid:
+        if post.id not in owned:
+            errors.append(BatchError(index=index, detail="Post not found or not authorized"))
+            continue
+        values = {"id": post.id}
+        if post.title:
+            values["title"] = post.title
+        if post.content:
+            values["content"] = post.content
+        changes.append(values)
 
+    posts = []
+    if changes:
+        # ORM bulk UPDATE by primary key
+        values = [change for change in changes if len(change) > 1]
+        if values:
+            await db.execute(update(models.Post), values)
+        result = await db.execute(select(models.Post).filter(models.Post.id.in_([change["id"] for change in changes])))
+        posts = result.scalars().all()
+        enqueue_email(
+            db,
+            subject="Posts Updated",
+            recipient=current_user.email,
+            body=f"Dear {current_user.username},\nYou updated {len(posts)} posts."
+        )
+        await db.commit()
+        await response_cache.invalidate("posts")
 
-    send_email.apply_async(
-        kwargs={
-            "subject": "New Post Created",
-            "recipient": current_user.email,
-            "body": f"Dear {current_user.username},\nYou created a post titled '{new_post.title}'."
-        }
+    errors.sort(key=lambda error: error.index)
+    return {"items": posts, "errors": errors}
+
+# Batch delete blogs owned by the current user with one DELETE ... RETURNING
+@router.delete("/batch", response_model=BatchDeleteResult, dependencies=[rate_limiter.limit("batch_write", "10/minute", key="user")])
+async def delete_posts_batch(
+    batch: BatchDelete,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    check_batch_size(batch.ids)
+    owned = select(models.Post.id).where(models.Post.id.in_(batch.ids), models.Post.user_id == current_user.id)
+    await summaries.forget_posts(db, owned)
+    result = await db.execute(
+        delete(models.Post)
+        .where(models.Post.id.in_(batch.ids), models.Post.user_id == current_user.id)
+        .returning(models.Post.id)
     )
+    deleted = set(result.scalars().all())
+    await db.commit()
+    await response_cache.invalidate("posts")
+    await response_cache.invalidate("comments")
 
-    return new_post
+    errors = [
+        BatchError(index=index, detail="Post not found or not authorized")
+        for index, post_id in enumerate(batch.ids)
+        if post_id not in deleted
+    ]
+    return {"deleted": sorted(deleted), "errors": errors}
 
 # 2. Update a blog
 @router.put("/{post_id}", response_model=schemas.PostResponse)
 async def update_post(post_id: int, post: schemas.PostUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    result = await db.execute(select(models.Post).filter(models.Post.id == post_id, models.Post.user_id == current_user.id))
+    # Ownership check and update in one statement; empty fields keep their value
+    result = await db.execute(
+        update(models.Post)
+        .where(models.Post.id == post_id, models.Post.user_id == current_user.id)
+        .values(title=post.title or models.Post.title, content=post.content or models.Post.content)
+        .returning(models.Post)
+    )
     db_post = result.scalars().first()
     if not db_post:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found or not authorized")
-    
-    if post.title:
-        db_post.title = post.title
-    if post.content:
-        db_post.content = post.content
 
-    await db.commit()  # Use async commit
-    await db.refresh(db_post)  # Use async refresh
-    
-    send_email.apply_async(
-        kwargs={
-            "subject": "Post Updated",
-            "recipient": current_user.email,
-            "body": f"Dear {current_user.username},\nYou updated a post titled '{db_post.title}'."
-        }
+    enqueue_email(
+        db,
+        subject="Post Updated",
+        recipient=current_user.email,
+        body=f"Dear {current_user.username},\nYou updated a post titled '{db_post.title}'."
     )
-        
+    await db.commit()  # Use async commit
+    await response_cache.invalidate("posts")
+
     return db_post
 
 # 3. Delete a blog
 @router.delete("/{post_id}")
 async def delete_post(post_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    result = await db.execute(select(models.Post).filter(models.Post.id == post_id, models.Post.user_id == current_user.id))
-    db_post = result.scalars().first()
-    if not db_post:
+    # Rolled back with the rest when the post is not found
+    await summaries.forget_posts(db, [post_id])
+    result = await db.execute(
+        delete(models.Post)
+        .where(models.Post.id == post_id, models.Post.user_id == current_user.id)
+        .returning(models.Post.id)
+    )
+    if result.first() is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found or not authorized")
-    
-    await db.delete(db_post)  # Use async delete
+
     await db.commit()  # Use async commit
+    await response_cache.invalidate("posts")
+    await response_cache.invalidate("comments")
     return {"message": "Post deleted successfully"}
 
+# Delete every blog created before a date, with its comments, in bounded batches (admin only)
+@router.delete("/", response_model=PurgeResult)
+async def delete_posts_before(
+    before: datetime,
+    batch_size: int = Query(PURGE_BATCH_SIZE, ge=1, le=MAX_PURGE_BATCH_SIZE),
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    await summaries.mark_stale(db)  # committed with the first batch
+    result = await purge_in_batches(db, models.Post, [models.Post.created_at < as_utc(before)], batch_size)
+    await response_cache.invalidate("posts")
+    await response_cache.invalidate("comments")
+    return result
+
 # 4. See all blogs
-@router.get("/", response_model=List[schemas.PostResponse])
-async def get_all_posts(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(models.Post))
-    posts = result.scalars().all()  # Fetch all posts asynchronously
-    return posts
+@router.get("/", response_model=schemas.PostPage)
+async def get_all_posts(
+    request: Request,
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+):
+    async def load():
+        # Opened on a cache miss only, so a hit costs no connection checkout
+        async with await open_read_session(request.headers.get("authorization")) as db:
+            if FAST_JSON_RESPONSES:
+                query = select(*columns_for(models.Post, schemas.PostResponse))
+                result = await db.execute(paginate(query, models.Post, cursor, limit, since, until))
+                return page_json(result.all(), limit)
+
+            query = paginate(select(models.Post), models.Post, cursor, limit, since, until)
+            result = await db.execute(query)
+            posts = result.scalars().all()  # Fetch one page of posts asynchronously
+        return schemas.PostPage.model_validate(build_page(posts, limit), from_attributes=True).model_dump_json()
+
+    return await response_cache.respond(request, "posts", load)
 
 # 5. See all blogs of the current user
-@router.get("/my-posts", response_model=List[schemas.PostResponse])
-async def get_my_posts(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    result = await db.execute(select(models.Post).filter(models.Post.user_id == current_user.id))
-    posts = result.scalars().all()  # Fetch user's posts asynchronously
-    return posts
+@router.get("/my-posts", response_model=schemas.PostPage)
+async def get_my_posts(
+    cursor: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: User = Depends(get_current_user),
+):
+    if FAST_JSON_RESPONSES:
+        query = select(*columns_for(models.Post, schemas.PostResponse)).filter(models.Post.user_id == current_user.id)
+        result = await db.execute(paginate(query, models.Post, cursor, limit, since, until))
+        return Response(content=page_json(result.all(), limit), media_type="application/json")
+
+    query = select(models.Post).filter(models.Post.user_id == current_user.id)
+    result = await db.execute(paginate(query, models.Post, cursor, limit, since, until))
+    posts = result.scalars().all()  # Fetch one page of user's posts asynchronously
+    return build_page(posts, limit)
+
+# 6. Export all blogs as NDJSON, streamed in batches
+@router.get("/export")
+async def export_posts(format: str = Query("ndjson", pattern="^ndjson$")):
+    query = select(models.Post).order_by(models.Post.id)
+    return ndjson_response([query], schemas.PostResponse, "posts")
+
+# 7. Search blogs by title and content, best matches first
+@router.get("/search", response_model=schemas.PostSearchPage)
+async def search_posts(
+    q: str = Query(..., min_length=1),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    rows, next_cursor = await search(db, models.Post, q, cursor, limit)
+    items = [{**schemas.PostResponse.model_validate(post).model_dump(), "rank": rank} for post, rank in rows]
+    return {"items": items, "next_cursor": next_cursor}
+
+def post_detail(post: models.Post, comments: List[Comment], comments_limit: int) -> dict:
+    page = build_page(comments, comments_limit)
+    return {
+        **schemas.PostResponse.model_validate(post).model_dump(),
+        "user": post.user,
+        "comments": page["items"],
+        "next_comments_cursor": page["next_cursor"],
+    }
+
+# 8. See several blogs with their first page of comments (?ids=1,2,3)
+@router.get("/batch", response_model=List[schemas.PostDetail])
+async def get_posts_by_ids(
+    ids: str,
+    comments_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    try:
+        post_ids = list(dict.fromkeys(int(post_id) for post_id in ids.split(",")))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="ids must be comma-separated integers")
+    if len(post_ids) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_PAGE_SIZE} ids per request")
+
+    # Two queries in total: posts with authors, then every post's comment page with authors
+    result = await db.execute(
+        select(models.Post).options(joinedload(models.Post.user)).filter(models.Post.id.in_(post_ids))
+    )
+    posts = {post.id: post for post in result.scalars().all()}
+
+    query = select(Comment).options(joinedload(Comment.user))
+    result = await db.execute(first_pages(query, Comment, Comment.post_id, list(posts), comments_limit))
+    comments = {post_id: [] for post_id in posts}
+    for comment in result.scalars().all():
+        comments[comment.post_id].append(comment)
+
+    # Short pages of old enough posts continue into the archive, with one more query
+    cutoff = archive_cutoff()
+    short = [post_id for post_id, post in posts.items() if len(comments[post_id]) <= comments_limit and as_utc(post.created_at) < cutoff]
+    if short:
+        query = select(CommentArchive).options(joinedload(CommentArchive.user))
+        result = await db.execute(first_pages(query, CommentArchive, CommentArchive.post_id, short, comments_limit))
+        for comment in result.scalars().all():
+            if len(comments[comment.post_id]) <= comments_limit:
+                comments[comment.post_id].append(comment)
+
+    return [post_detail(posts[post_id], comments[post_id], comments_limit) for post_id in post_ids if post_id in posts]
+
+# Blogs with the most comments in the last TRENDING_WINDOW_HOURS, from the trending_posts summary
+@router.get("/trending", response_model=schemas.PostTrendingPage)
+async def get_trending_posts(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    rows, refreshed_at, source = await summaries.trending_posts(db, limit)
+    items = [
+        {
+            **schemas.PostResponse.model_validate(post).model_dump(),
+            "recent_comments": recent_comments,
+            "comments_per_hour": recent_comments / summaries.TRENDING_WINDOW_HOURS,
+        }
+        for post, recent_comments in rows
+    ]
+    return {"items": items, "window_hours": summaries.TRENDING_WINDOW_HOURS, "refreshed_at": refreshed_at, "source": source}
+
+# 9. See one blog with a page of its comments
+@router.get("/{post_id}", response_model=schemas.PostDetail)
+async def get_post(
+    post_id: int,
+    comments_cursor: Optional[str] = None,
+    comments_limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_read_db),
+):
+    result = await db.execute(
+        select(models.Post).options(joinedload(models.Post.user)).filter(models.Post.id == post_id)
+    )
+    post = result.scalars().first()
+    if not post:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+
+    query = select(Comment).options(joinedload(Comment.user)).filter(Comment.post_id == post_id)
+    result = await db.execute(paginate(query, Comment, comments_cursor, comments_limit))
+    comments = result.scalars().all()
+    # Out of live comments: archived ones are all older, so the page continues there.
+    # Posts newer than the archive cutoff cannot have any.
+    if len(comments) <= comments_limit and as_utc(post.created_at) < archive_cutoff():
+        cursor = encode_cursor(comments[-1].created_at, comments[-1].id) if comments else comments_cursor
+        query = select(CommentArchive).options(joinedload(CommentArchive.user)).filter(CommentArchive.post_id == post_id)
+        result = await db.execute(paginate(query, CommentArchive, cursor, comments_limit - len(comments)))
+        comments += result.scalars().all()
+    return post_detail(post, comments, comments_limit)
+
+# 10. Follow new, edited and deleted comments of a blog live (Server-Sent Events)
+@router.get("/{post_id}/comments/stream")
+async def stream_post_comments(post_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    result = await db.execute(select(models.Post.id).filter(models.Post.id == post_id))
+    if result.first() is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    # Hand the connection back now: the stream itself holds none
+    await db.close()
+
+    comment_broker.check_capacity()
+    return StreamingResponse(
+        comment_broker.stream(request, post_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,6 +1,9 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Literal, Optional
 from datetime import datetime
+from blog_app.comments.schemas import CommentDetail
+from blog_app.users.schemas import AuthorSummary
+from batch import BatchError
 
 class PostBase(BaseModel):
     title: str
@@ -13,10 +16,45 @@ class PostUpdate(BaseModel):
     title: Optional[str] = None
     content: Optional[str] = None
 
+class PostBatchUpdate(PostUpdate):
+    id: int
+
 class PostResponse(PostBase):
     id: int
     user_id: int
     created_at: datetime
+    comment_count: int = 0
+    last_comment_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
+
+class PostPage(BaseModel):
+    items: List[PostResponse]
+    next_cursor: Optional[str] = None
+
+class PostDetail(PostResponse):
+    user: AuthorSummary
+    comments: List[CommentDetail]
+    next_comments_cursor: Optional[str] = None
+
+class PostBatchResult(BaseModel):
+    items: List[PostResponse]
+    errors: List[BatchError]
+
+class PostSearchResult(PostResponse):
+    rank: float
+
+class PostSearchPage(BaseModel):
+    items: List[PostSearchResult]
+    next_cursor: Optional[str] = None
+
+class PostTrendingResult(PostResponse):
+    recent_comments: int
+    comments_per_hour: float
+
+class PostTrendingPage(BaseModel):
+    items: List[PostTrendingResult]
+    window_hours: float
+    refreshed_at: datetime
+    source: Literal["summary", "live"]
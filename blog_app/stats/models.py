@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
+from database import Base
+
+# Per-user totals, refreshed by the refresh_summaries task (see summaries.py)
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    post_count = Column(Integer, nullable=False)
+    comment_count = Column(Integer, nullable=False)      # comments the user wrote, archived ones included
+    comments_received = Column(Integer, nullable=False)  # comments on the user's posts
+    last_post_at = Column(DateTime(timezone=True), nullable=True)
+    last_comment_at = Column(DateTime(timezone=True), nullable=True)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+
+# Posts commented on within the trending window, with their comment counts in it
+class TrendingPost(Base):
+    __tablename__ = "trending_posts"
+    __table_args__ = (
+        Index("ix_trending_posts_recent_comments_post_id", "recent_comments", "post_id"),
+    )
+
+    post_id = Column(Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True)
+    recent_comments = Column(Integer, nullable=False)
+    last_comment_at = Column(DateTime(timezone=True), nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
+
+# When each summary was last refreshed: the staleness check for reads and the
+# starting point of the next incremental refresh
+class SummaryRefresh(Base):
+    __tablename__ = "summary_refreshes"
+
+    name = Column(String, primary_key=True)
+    refreshed_at = Column(DateTime(timezone=True), nullable=False)
@@ -0,0 +1,224 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import DateTime, delete, func, insert, literal, or_, union
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy.future import select
+from typing import Optional
+from dotenv import load_dotenv
+from blog_app.users.models import User
+from blog_app.posts.models import Post
+from blog_app.comments.models import Comment, CommentArchive
+from blog_app.stats.models import SummaryRefresh, TrendingPost, UserStats
+from pagination import as_utc
+import os
+
+load_dotenv()
+
+# Summary table settings
+STATS_MAX_STALENESS_SECONDS = float(os.getenv('STATS_MAX_STALENESS_SECONDS', 300))
+# Incremental refreshes look this far behind the last one, for clock skew and transactions still in flight
+STATS_REFRESH_OVERLAP_SECONDS = float(os.getenv('STATS_REFRESH_OVERLAP_SECONDS', 60))
+STATS_BATCH_SIZE = int(os.getenv('STATS_BATCH_SIZE', 1000))
+TRENDING_WINDOW_HOURS = float(os.getenv('TRENDING_WINDOW_HOURS', 24))
+
+USER_STATS = "user_stats"
+TRENDING_POSTS = "trending_posts"
+USER_STATS_COLUMNS = ("user_id", "post_count", "comment_count", "comments_received", "last_post_at", "last_comment_at")
+
+
+# The live aggregates. The summaries store their results, and reads fall back
+# to them when a summary is too stale.
+
+def live_user_stats():
+    def by_user(model, aggregate):
+        return select(aggregate).where(model.user_id == User.id).scalar_subquery()
+
+    return select(
+        User.id.label("user_id"),
+        by_user(Post, func.count(Post.id)).label("post_count"),
+        (by_user(Comment, func.count(Comment.id)) + by_user(CommentArchive, func.count(CommentArchive.id))).label("comment_count"),
+        # posts.comment_count is already maintained per post (see counters.py)
+        by_user(Post, func.coalesce(func.sum(Post.comment_count), 0)).label("comments_received"),
+        by_user(Post, func.max(Post.created_at)).label("last_post_at"),
+        # Archived comments are always older than live ones
+        func.coalesce(
+            by_user(Comment, func.max(Comment.created_at)), by_user(CommentArchive, func.max(CommentArchive.created_at))
+        ).label("last_comment_at"),
+    )
+
+
+def live_trending(window_start: datetime):
+    # Only reads the window, through the (created_at, id) index
+    return (
+        select(
+            Comment.post_id,
+            func.count(Comment.id).label("recent_comments"),
+            func.max(Comment.created_at).label("last_comment_at"),
+        )
+        .where(Comment.created_at >= window_start)
+        .group_by(Comment.post_id)
+    )
+
+
+async def last_refreshed(db, name: str) -> Optional[datetime]:
+    result = await db.execute(select(SummaryRefresh.refreshed_at).where(SummaryRefresh.name == name))
+    refreshed_at = result.scalar()
+    return as_utc(refreshed_at) if refreshed_at is not None else None
+
+
+def is_fresh(refreshed_at: Optional[datetime]) -> bool:
+    return refreshed_at is not None and datetime.now(timezone.utc) - as_utc(refreshed_at) <= timedelta(seconds=STATS_MAX_STALENESS_SECONDS)
+
+
+async def _mark_refreshed(conn: AsyncConnection, name: str, refreshed_at: datetime) -> None:
+    await conn.execute(delete(SummaryRefresh).where(SummaryRefresh.name == name))
+    await conn.execute(insert(SummaryRefresh).values(name=name, refreshed_at=refreshed_at))
+
+
+# Refreshing
+
+async def _replace_user_stats(conn: AsyncConnection, matches, refreshed_at: datetime) -> int:
+    # matches(column) selects the users to recompute, one transaction per call
+    await conn.execute(delete(UserStats).where(matches(UserStats.user_id)))
+    result = await conn.execute(
+        insert(UserStats).from_select(
+            (*USER_STATS_COLUMNS, "refreshed_at"),
+            live_user_stats().add_columns(literal(refreshed_at, DateTime(timezone=True))).where(matches(User.id)),
+        )
+    )
+    await conn.commit()
+    return result.rowcount
+
+
+# Incremental by default: only users who posted, commented or were commented on
+# since the last refresh, or who have no row, are recomputed. Deletes leave no
+# such trace, so the delete routes drop the rows they affect (see below) and a
+# full refresh (every user, in id ranges) runs periodically as well.
+async def refresh_user_stats(conn: AsyncConnection, full: bool = False) -> int:
+    started_at = datetime.now(timezone.utc)
+    since = None if full else await last_refreshed(conn, USER_STATS)
+    refreshed = 0
+    if since is None:
+        max_id = (await conn.execute(select(func.max(User.id)))).scalar() or 0
+        for start in range(0, max_id, STATS_BATCH_SIZE):
+            refreshed += await _replace_user_stats(
+                conn, lambda column: column.between(start + 1, start + STATS_BATCH_SIZE), started_at
+            )
+    else:
+        since -= timedelta(seconds=STATS_REFRESH_OVERLAP_SECONDS)
+        changed = union(
+            select(Post.user_id).where(Post.created_at >= since),
+            select(Comment.user_id).where(Comment.created_at >= since),
+            select(Post.user_id).join(Comment, Comment.post_id == Post.id).where(Comment.created_at >= since),
+            # Users whose row a delete dropped (see forget_posts), and new users
+            select(User.id).where(~select(UserStats.user_id).where(UserStats.user_id == User.id).exists()),
+        )
+        user_ids = (await conn.execute(changed)).scalars().all()
+        for start in range(0, len(user_ids), STATS_BATCH_SIZE):
+            batch = user_ids[start:start + STATS_BATCH_SIZE]
+            refreshed += await _replace_user_stats(conn, lambda column: column.in_(batch), started_at)
+    await _mark_refreshed(conn, USER_STATS, started_at)
+    await conn.commit()
+    return refreshed
+
+
+# Rebuilt from the comments of the window in one transaction; its cost follows
+# the activity in the window, not the size of the comments table
+async def refresh_trending(conn: AsyncConnection) -> int:
+    refreshed_at = datetime.now(timezone.utc)
+    window_start = refreshed_at - timedelta(hours=TRENDING_WINDOW_HOURS)
+    await conn.execute(delete(TrendingPost))
+    result = await conn.execute(
+        insert(TrendingPost).from_select(
+            ("post_id", "recent_comments", "last_comment_at", "refreshed_at"),
+            live_trending(window_start).add_columns(literal(refreshed_at, DateTime(timezone=True))),
+        )
+    )
+    await _mark_refreshed(conn, TRENDING_POSTS, refreshed_at)
+    await conn.commit()
+    return result.rowcount
+
+
+async def refresh_summaries(conn: AsyncConnection, full: bool = False) -> dict:
+    return {USER_STATS: await refresh_user_stats(conn, full), TRENDING_POSTS: await refresh_trending(conn)}
+
+
+# Deletes, in the transaction of the delete. Users without a summary row are
+# read live until the next refresh recomputes them.
+
+def _drop_user_stats(users):
+    return delete(UserStats).where(UserStats.user_id.in_(users)).execution_options(synchronize_session=False)
+
+
+# Before deleting posts: their authors and commenters lose counts. Their
+# trending rows go with them (ON DELETE CASCADE).
+async def forget_posts(db: AsyncSession, post_ids) -> None:
+    await db.execute(_drop_user_stats(union(
+        select(Post.user_id).where(Post.id.in_(post_ids)),
+        select(Comment.user_id).where(Comment.post_id.in_(post_ids)),
+        select(CommentArchive.user_id).where(CommentArchive.post_id.in_(post_ids)),
+    )))
+
+
+# After deleting a user's comments on some posts
+async def forget_comments(db: AsyncSession, user_id: int, post_ids) -> None:
+    post_ids = list(post_ids)
+    await db.execute(_drop_user_stats(union(select(literal(user_id)), select(Post.user_id).where(Post.id.in_(post_ids)))))
+    # The posts' trending rows are recomputed over the window of the last refresh
+    refreshed_at = await last_refreshed(db, TRENDING_POSTS)
+    await db.execute(
+        delete(TrendingPost).where(TrendingPost.post_id.in_(post_ids)).execution_options(synchronize_session=False)
+    )
+    if refreshed_at is not None:
+        window_start = refreshed_at - timedelta(hours=TRENDING_WINDOW_HOURS)
+        await db.execute(
+            insert(TrendingPost).from_select(
+                ("post_id", "recent_comments", "last_comment_at", "refreshed_at"),
+                live_trending(window_start)
+                .where(Comment.post_id.in_(post_ids))
+                .add_columns(literal(refreshed_at, DateTime(timezone=True))),
+            )
+        )
+
+
+# Deletes too large to track row by row: every read goes live and the next refresh is a full one
+async def mark_stale(db: AsyncSession) -> None:
+    await db.execute(delete(SummaryRefresh).execution_options(synchronize_session=False))
+
+
+# Reading, within STATS_MAX_STALENESS_SECONDS
+
+async def user_stats(db: AsyncSession, user_id: int) -> Optional[dict]:
+    refreshed_at = await last_refreshed(db, USER_STATS)
+    if is_fresh(refreshed_at):
+        result = await db.execute(select(UserStats).where(UserStats.user_id == user_id))
+        stats = result.scalars().first()
+        if stats is not None:
+            # Rows are only rewritten when the user changed, so they are as current as the last refresh
+            return {
+                **{column: getattr(stats, column) for column in USER_STATS_COLUMNS},
+                "refreshed_at": refreshed_at,
+                "source": "summary",
+            }
+    # Stale summary, or no activity since the last full refresh: aggregate this one user
+    result = await db.execute(live_user_stats().where(User.id == user_id))
+    row = result.first()
+    if row is None:
+        return None
+    return {**row._asdict(), "refreshed_at": datetime.now(timezone.utc), "source": "live"}
+
+
+# Returns (post, recent comments) pairs, the time they are current as of, and their source
+async def trending_posts(db: AsyncSession, limit: int):
+    refreshed_at = await last_refreshed(db, TRENDING_POSTS)
+    if is_fresh(refreshed_at):
+        source, trending = "summary", TrendingPost.__table__
+    else:
+        refreshed_at = datetime.now(timezone.utc)
+        source, trending = "live", live_trending(refreshed_at - timedelta(hours=TRENDING_WINDOW_HOURS)).subquery()
+    result = await db.execute(
+        select(Post, trending.c.recent_comments)
+        .join(trending, trending.c.post_id == Post.id)
+        .order_by(trending.c.recent_comments.desc(), trending.c.post_id.desc())
+        .limit(limit)
+    )
+    return result.all(), refreshed_at, source
@@ -2,8 +2,17 @@ from passlib.context import CryptContext
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
 from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from blog_app.users.models import User
+from database import get_db
+import asyncio
 import os
+import time
 
 load_dotenv()
 
@@ -16,6 +25,71 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+# Password hashing pool settings
+HASH_POOL_SIZE = int(os.getenv('HASH_POOL_SIZE', 4))
+HASH_QUEUE_LIMIT = int(os.getenv('HASH_QUEUE_LIMIT', 32))
+
+class HashPool:
+    """Bounded thread pool that keeps bcrypt off the event loop."""
+
+    def __init__(self, size: int, queue_limit: int):
+        self.size = size
+        self.queue_limit = queue_limit
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="bcrypt")
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def run(self, func, *args):
+        # Fast reject instead of queueing without bound when the pool is saturated
+        if self.pending >= self.size + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many concurrent password operations, retry later",
+                headers={"Retry-After": "1"},
+            )
+
+        submitted_at = time.perf_counter()
+
+        def task():
+            return time.perf_counter() - submitted_at, func(*args)
+
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(task)
+        self.pending += 1
+        # Counted until the job itself ends: a caller that is cancelled stops waiting,
+        # but a job already running keeps its thread
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._job_done))
+        waited, result = await asyncio.wrap_future(future)
+        self.completed += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        return result
+
+    def _job_done(self) -> None:
+        self.pending -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "wait_avg_seconds": self.wait_total / self.completed if self.completed else 0.0,
+            "wait_max_seconds": self.wait_max,
+        }
+
+hash_pool = HashPool(HASH_POOL_SIZE, HASH_QUEUE_LIMIT)
+
+async def hash_password_async(password: str) -> str:
+    return await hash_pool.run(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hash_pool.run(verify_password, plain_password, hashed_password)
+
 # JWT settings
 SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = os.getenv('ALGORITHM')
@@ -36,3 +110,82 @@ def verify_access_token(token: str) -> dict:
 
 # OAuth2PasswordBearer instance
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
+
+# Auth cache settings
+AUTH_CACHE_SIZE = int(os.getenv('AUTH_CACHE_SIZE', 1024))
+AUTH_CACHE_TTL = float(os.getenv('AUTH_CACHE_TTL', 60))
+
+class AuthCache:
+    """Bounded LRU cache of token -> user with a per-entry expiry."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, token: str):
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[token]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return user
+
+    def set(self, token: str, user, exp: float) -> None:
+        # Never keep an entry past the token's own expiry
+        lifetime = min(self.ttl, exp - time.time())
+        if lifetime <= 0 or self.maxsize <= 0:
+            return
+        self._entries[token] = (user, time.monotonic() + lifetime)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, username: str) -> None:
+        for token in [t for t, (user, _) in self._entries.items() if user.username == username]:
+            del self._entries[token]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+auth_cache = AuthCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL)
+
+# Shared dependency to get the current user, served from auth_cache when possible
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
+    user = auth_cache.get(token)
+    if user is not None:
+        return user
+
+    payload = verify_access_token(token)
+    if not payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
+
+    username = payload.get("sub")
+    result = await db.execute(select(User).filter(User.username == username))
+    user = result.scalars().first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+
+    # Detach the row so it can be shared safely across request sessions
+    db.expunge(user)
+    auth_cache.set(token, user, payload["exp"])
+    return user
+
+# Usernames allowed to run admin operations such as bulk deletes
+ADMIN_USERNAMES = {name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip()}
+
+async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.username not in ADMIN_USERNAMES:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
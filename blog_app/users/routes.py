@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select  # To use AsyncSession for querying
 from blog_app.users import models, schemas, dependencies
-from database import get_db
+from blog_app.stats import summaries
+from database import get_db, get_read_db, insert_ignore
+from ratelimit import rate_limiter
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Security
 
@@ -11,33 +13,41 @@ router = APIRouter()
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
 
 
-@router.post("/register", response_model=schemas.UserResponse)
+@router.post("/register", response_model=schemas.UserResponse, dependencies=[rate_limiter.limit("register", "5/minute")])
 async def register_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
-    # Use async query with 'select'
-    result = await db.execute(select(models.User).filter(models.User.username == user.username))
-    db_user = result.scalars().first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="Username already registered")
-    
-    result = await db.execute(select(models.User).filter(models.User.email == user.email))
-    db_user = result.scalars().first()
-    if db_user:
+    hashed_password = await dependencies.hash_password_async(user.password)
+    # One INSERT: the unique constraints decide, so concurrent registrations cannot both succeed
+    result = await db.execute(
+        insert_ignore(db, models.User)
+        .values(username=user.username, email=user.email, hashed_password=hashed_password, age=user.age)
+        .returning(models.User)
+    )
+    new_user = result.scalars().first()
+    if new_user is None:
+        # Only on conflict: find out which constraint it was
+        result = await db.execute(select(models.User.id).filter(models.User.username == user.username))
+        if result.first():
+            raise HTTPException(status_code=400, detail="Username already registered")
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    hashed_password = dependencies.hash_password(user.password)
-    new_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password,age=user.age)
-    db.add(new_user)
     await db.commit()  # Use async commit
-    await db.refresh(new_user)  # Use async refresh
     return new_user
 
 # Login route with JWT generation
-@router.post("/login", response_model=schemas.TokenResponse)
+@router.post("/login", response_model=schemas.TokenResponse, dependencies=[rate_limiter.limit("login", "10/minute")])
 async def login_user(user: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
     result = await db.execute(select(models.User).filter(models.User.username == user.username))
     db_user = result.scalars().first()
-    if not db_user or not dependencies.verify_password(user.password, db_user.hashed_password):
+    if not db_user or not await dependencies.verify_password_async(user.password, db_user.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     access_token = dependencies.create_access_token(data={"sub": user.username})
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+# Activity totals of a user, from the user_stats summary while it is fresh enough
+@router.get("/{user_id}/stats", response_model=schemas.UserStatsResponse)
+async def get_user_stats(user_id: int, db: AsyncSession = Depends(get_read_db)):
+    stats = await summaries.user_stats(db, user_id)
+    if stats is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    return stats
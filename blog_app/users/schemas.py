@@ -1,4 +1,6 @@
 from pydantic import BaseModel, EmailStr
+from datetime import datetime
+from typing import Literal, Optional
 
 class UserCreate(BaseModel):
     username: str
@@ -20,6 +22,23 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AuthorSummary(BaseModel):
+    id: int
+    username: str
+
+    class Config:
+        from_attributes = True
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str
+
+class UserStatsResponse(BaseModel):
+    user_id: int
+    post_count: int
+    comment_count: int
+    comments_received: int
+    last_post_at: Optional[datetime]
+    last_comment_at: Optional[datetime]
+    refreshed_at: datetime
+    source: Literal["summary", "live"]
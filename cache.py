@@ -0,0 +1,150 @@
+from fastapi import Request, Response, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from dotenv import load_dotenv
+from database import wrote_recently
+import hashlib
+import logging
+import os
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Response cache settings. Leave RESPONSE_CACHE_URL unset to disable caching,
+# or set it to memory:// to use the in-process fake (tests, local development).
+RESPONSE_CACHE_URL = os.getenv('RESPONSE_CACHE_URL')
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 30))
+
+# Bounds of the in-process stand-in: keys kept, and how often expired keys are swept
+MEMORY_REDIS_MAX_KEYS = int(os.getenv('MEMORY_REDIS_MAX_KEYS', 100000))
+MEMORY_REDIS_SWEEP_SECONDS = float(os.getenv('MEMORY_REDIS_SWEEP_SECONDS', 60))
+
+
+class MemoryRedis:
+    """In-process stand-in for the few Redis commands the cache uses.
+
+    Keys that are written but never read again (idempotency keys, old cache
+    versions) are dropped by a periodic sweep of expired keys; beyond max_keys
+    the oldest writes are evicted, like Redis with an LRU maxmemory policy.
+    """
+
+    def __init__(self, max_keys: int = MEMORY_REDIS_MAX_KEYS, sweep_seconds: float = MEMORY_REDIS_SWEEP_SECONDS):
+        self._data = {}
+        self.max_keys = max_keys
+        self.sweep_seconds = sweep_seconds
+        self._next_sweep = time.monotonic() + sweep_seconds
+
+    def _store(self, key, value, expires_at):
+        # Re-inserting moves the key to the end, so the dict stays in write order
+        self._data.pop(key, None)
+        self._data[key] = (value, expires_at)
+        now = time.monotonic()
+        if now >= self._next_sweep or len(self._data) > self.max_keys:
+            self._sweep(now)
+
+    def _sweep(self, now: float):
+        self._next_sweep = now + self.sweep_seconds
+        for key in [key for key, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]:
+            del self._data[key]
+        while len(self._data) > self.max_keys:
+            del self._data[next(iter(self._data))]
+
+    async def get(self, key):
+        value, expires_at = self._data.get(key, (None, None))
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and await self.get(key) is not None:
+            return None
+        if isinstance(value, str):
+            value = value.encode()
+        self._store(key, value, time.monotonic() + ex if ex else None)
+        return True
+
+    async def incr(self, key):
+        value = int(await self.get(key) or 0) + 1
+        self._store(key, str(value).encode(), None)
+        return value
+
+    async def delete(self, *keys):
+        return sum(self._data.pop(key, None) is not None for key in keys)
+
+    async def flushall(self):
+        self._data.clear()
+
+
+def make_client(url):
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryRedis()
+    return Redis.from_url(url)
+
+
+class ResponseCache:
+    """Caches serialized listing pages per namespace with write-through invalidation.
+
+    Every namespace has a version counter that is part of the cache key, so
+    bumping it on writes makes all cached pages of that namespace unreachable
+    at once; the stale entries then simply expire. Users who just wrote bypass
+    the cache, like they bypass the replicas, so they see their own changes.
+    """
+
+    def __init__(self, client, ttl: int):
+        self.client = client
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def _version(self, namespace: str) -> bytes:
+        return await self.client.get(f"cache:{namespace}:version") or b"0"
+
+    async def respond(self, request: Request, namespace: str, load) -> Response:
+        body = None
+        key = None
+        if self.client is not None and not wrote_recently(request.headers.get("authorization")):
+            try:
+                version = (await self._version(namespace)).decode()
+                key = f"cache:{namespace}:v{version}:{request.url.path}?{request.url.query}"
+                body = await self.client.get(key)
+            except (RedisError, OSError):
+                logger.warning("Response cache unavailable, serving from the database", exc_info=True)
+                key = None
+
+        if body is None:
+            self.misses += 1
+            body = await load()
+            if isinstance(body, str):
+                body = body.encode()
+            if key is not None:
+                try:
+                    await self.client.set(key, body, ex=self.ttl)
+                except (RedisError, OSError):
+                    logger.warning("Could not store response in cache", exc_info=True)
+        else:
+            self.hits += 1
+
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    async def invalidate(self, namespace: str) -> None:
+        if self.client is None:
+            return
+        try:
+            await self.client.incr(f"cache:{namespace}:version")
+        except (RedisError, OSError):
+            logger.warning("Could not invalidate cached %s pages", namespace, exc_info=True)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache(make_client(RESPONSE_CACHE_URL), RESPONSE_CACHE_TTL)
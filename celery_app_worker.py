@@ -1,23 +1,184 @@
 from celery import Celery
+from celery.signals import task_failure, task_postrun, task_prerun, task_retry, worker_ready
 from dotenv import load_dotenv
+from email.message import EmailMessage
+from prometheus_client import Counter, Histogram, start_http_server
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.pool import NullPool
+from blog_app.comments.archive import archive_comments, archive_cutoff
+from blog_app.posts.counters import recount_comments
+from blog_app.stats.summaries import refresh_summaries
+from blog_app.posts.models import Post
+from blog_app.users.models import User  # Post relationships need every mapper registered
+import asyncio
+import logging
 import os
+import smtplib
+import time
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 celery_app = Celery(
     broker = os.getenv('REDIS_BROKER'),
     backend = os.getenv('REDIS_BACKEND')
 )
+# Queues, routing, prefetch, acks and the beat schedule (see celery_config.py)
+celery_app.config_from_object("celery_config")
 
-@celery_app.task()
+# SMTP settings. Without SMTP_HOST emails are only printed (simulated);
+# python -m blog_app.notifications.smtp_stub runs a local stub server on port 1025.
+SMTP_HOST = os.getenv('SMTP_HOST')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 1025))
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', 10))
+SMTP_USERNAME = os.getenv('SMTP_USERNAME')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', 'false').lower() == 'true'
+EMAIL_SENDER = os.getenv('EMAIL_SENDER', 'blog@example.com')
+
+# Task timing metrics, served by the worker when CELERY_METRICS_PORT is set
+CELERY_METRICS_PORT = int(os.getenv('CELERY_METRICS_PORT', 0))
+TASK_DURATION = Histogram("celery_task_duration_seconds", "Celery task run time", ["task", "state"])
+TASK_RETRIES = Counter("celery_task_retries", "Celery task retries", ["task"])
+TASK_FAILURES = Counter("celery_task_failures", "Celery task failures", ["task"])
+_task_started_at = {}
+
+
+@worker_ready.connect
+def _serve_metrics(**kwargs):
+    # With the prefork pool tasks run in child processes, whose metrics this
+    # server cannot see: use it with the eventlet, gevent or threads pool.
+    if CELERY_METRICS_PORT:
+        start_http_server(CELERY_METRICS_PORT)
+
+
+@task_prerun.connect
+def _task_started(task_id=None, **kwargs):
+    _task_started_at[task_id] = time.perf_counter()
+
+
+@task_postrun.connect
+def _task_finished(task_id=None, task=None, state=None, **kwargs):
+    started_at = _task_started_at.pop(task_id, None)
+    if started_at is not None:
+        duration = time.perf_counter() - started_at
+        TASK_DURATION.labels(task.name, state or "UNKNOWN").observe(duration)
+        logger.info("Task %s[%s] %s in %.3fs", task.name, task_id, state, duration)
+
+
+@task_retry.connect
+def _task_retried(sender=None, **kwargs):
+    TASK_RETRIES.labels(sender.name).inc()
+
+
+@task_failure.connect
+def _task_failed(sender=None, **kwargs):
+    TASK_FAILURES.labels(sender.name).inc()
+
+
+def _email(subject: str, recipient: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = EMAIL_SENDER
+    message["To"] = recipient
+    message["Subject"] = subject
+    message.set_content(body)
+    return message
+
+
+def _smtp_connection() -> smtplib.SMTP:
+    smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    if SMTP_STARTTLS:
+        smtp.starttls()
+    if SMTP_USERNAME:
+        smtp.login(SMTP_USERNAME, SMTP_PASSWORD)
+    return smtp
+
+
+# Connection-level errors are retried; with acks_late a retried batch may resend some emails
+@celery_app.task(autoretry_for=(OSError, smtplib.SMTPServerDisconnected), retry_backoff=True, max_retries=5)
 def send_email(subject: str, recipient: str, body: str):
-    print("\n[Email Task]")
-    print(f"To: {recipient}")
-    print(f"Subject: {subject}")
-    print(f"Body:\n{body}")
-    return "Email sent (simulated)"
+    if not SMTP_HOST:
+        print("\n[Email Task]")
+        print(f"To: {recipient}")
+        print(f"Subject: {subject}")
+        print(f"Body:\n{body}")
+        return "Email sent (simulated)"
+    with _smtp_connection() as smtp:
+        smtp.send_message(_email(subject, recipient, body))
+    return "Email sent"
 
 
+@celery_app.task(autoretry_for=(OSError, smtplib.SMTPServerDisconnected), retry_backoff=True, max_retries=5)
+def send_email_batch(emails: list):
+    # Many emails over one SMTP connection (one handshake, one TLS setup, one login)
+    if not SMTP_HOST:
+        for email in emails:
+            send_email.run(**email)
+        return f"{len(emails)} emails sent (simulated)"
+    sent = 0
+    with _smtp_connection() as smtp:
+        for email in emails:
+            try:
+                smtp.send_message(_email(**email))
+                sent += 1
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError):
+                # A bad recipient must not fail the rest of the batch
+                logger.warning("Could not send email to %s", email["recipient"], exc_info=True)
+    return f"{sent} of {len(emails)} emails sent"
 
-# celery_app.register_task(send_email)
 
+# Posts per UPDATE when reconciling comment counters
+RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', 5000))
+
+async def _reconcile_comment_counts() -> int:
+    # A fresh engine per run: each task runs its own event loop, so pooled
+    # connections from an earlier loop could not be reused
+    engine = create_async_engine(os.getenv('DATABASE_URL'), poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            max_id = (await conn.execute(select(func.max(Post.id)))).scalar() or 0
+            for start in range(0, max_id, RECONCILE_BATCH_SIZE):
+                await conn.execute(
+                    recount_comments().where(Post.id > start, Post.id <= start + RECONCILE_BATCH_SIZE)
+                )
+                await conn.commit()
+        return max_id
+    finally:
+        await engine.dispose()
+
+@celery_app.task()
+def reconcile_comment_counts():
+    # Repairs any drift in posts.comment_count / posts.last_comment_at
+    return f"Reconciled comment counters up to post {asyncio.run(_reconcile_comment_counts())}"
+
+
+async def _archive_old_comments() -> int:
+    engine = create_async_engine(os.getenv('DATABASE_URL'), poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            return await archive_comments(conn, archive_cutoff())
+    finally:
+        await engine.dispose()
+
+@celery_app.task()
+def archive_old_comments():
+    # Keeps the comments table (and its indexes) down to recent history; safe to rerun
+    return f"Archived {asyncio.run(_archive_old_comments())} comments"
+
+
+async def _refresh_summary_tables(full: bool) -> dict:
+    engine = create_async_engine(os.getenv('DATABASE_URL'), poolclass=NullPool)
+    try:
+        async with engine.connect() as conn:
+            return await refresh_summaries(conn, full)
+    finally:
+        await engine.dispose()
+
+@celery_app.task()
+def refresh_summary_tables(full: bool = False):
+    # Incremental user_stats and a rebuilt trending_posts; full=True recomputes every user
+    refreshed = asyncio.run(_refresh_summary_tables(full))
+    return f"Refreshed {refreshed['user_stats']} user stats and {refreshed['trending_posts']} trending posts"
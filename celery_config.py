@@ -0,0 +1,81 @@
+"""Celery worker configuration, loaded with ``celery_app.config_from_object``.
+
+Tasks are split over two queues so each can get a worker tuned for it:
+
+* ``notifications``: short, I/O-bound email tasks. Run them on an eventlet
+  (or gevent) pool with high concurrency, since workers mostly wait on SMTP.
+* ``maintenance``: long, database-bound periodic jobs. Run them on a small
+  prefork pool with a prefetch of 1, so one long task never holds others back.
+
+The pool itself must be picked on the command line (``-P eventlet``): set in
+config, eventlet/gevent would monkey-patch too late. See the Readme.
+"""
+from kombu import Queue
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+broker_url = os.getenv('REDIS_BROKER')
+result_backend = os.getenv('REDIS_BACKEND')
+
+NOTIFICATIONS_QUEUE = "notifications"
+MAINTENANCE_QUEUE = "maintenance"
+
+task_queues = (Queue(NOTIFICATIONS_QUEUE), Queue(MAINTENANCE_QUEUE))
+task_default_queue = NOTIFICATIONS_QUEUE
+task_routes = {
+    "celery_app_worker.send_email": {"queue": NOTIFICATIONS_QUEUE},
+    "celery_app_worker.send_email_batch": {"queue": NOTIFICATIONS_QUEUE},
+    "celery_app_worker.reconcile_comment_counts": {"queue": MAINTENANCE_QUEUE},
+    "celery_app_worker.archive_old_comments": {"queue": MAINTENANCE_QUEUE},
+    "celery_app_worker.refresh_summary_tables": {"queue": MAINTENANCE_QUEUE},
+}
+
+# Acknowledge after the task ran, so a crashed worker's tasks are redelivered
+# instead of lost; tasks must therefore tolerate running twice.
+task_acks_late = True
+task_reject_on_worker_lost = True
+
+# Messages reserved per worker process (or green thread pool). Keep it low
+# for long tasks; I/O-bound workers with many green threads can take more.
+worker_prefetch_multiplier = int(os.getenv('CELERY_PREFETCH_MULTIPLIER', 4))
+
+# Nobody reads the results of fire-and-forget notifications
+task_ignore_result = os.getenv('CELERY_IGNORE_RESULT', 'true').lower() == 'true'
+
+# Protects the SMTP relay from bursts, per worker
+task_annotations = {
+    "celery_app_worker.send_email": {"rate_limit": os.getenv('EMAIL_RATE_LIMIT', '100/s')},
+    "celery_app_worker.send_email_batch": {"rate_limit": os.getenv('EMAIL_BATCH_RATE_LIMIT', '10/s')},
+}
+
+task_soft_time_limit = int(os.getenv('CELERY_TASK_SOFT_TIME_LIMIT', 300))
+task_time_limit = int(os.getenv('CELERY_TASK_TIME_LIMIT', 360))
+
+worker_send_task_events = True
+task_send_sent_event = True
+
+beat_schedule = {
+    "reconcile-comment-counts": {
+        "task": "celery_app_worker.reconcile_comment_counts",
+        "schedule": float(os.getenv('RECONCILE_INTERVAL_SECONDS', 3600)),
+    },
+    "archive-old-comments": {
+        "task": "celery_app_worker.archive_old_comments",
+        "schedule": float(os.getenv('COMMENT_ARCHIVE_INTERVAL_SECONDS', 86400)),
+    },
+    # Must run well within STATS_MAX_STALENESS_SECONDS, or reads fall back to live aggregates;
+    # a run still queued when the next is due is dropped
+    "refresh-summary-tables": {
+        "task": "celery_app_worker.refresh_summary_tables",
+        "schedule": float(os.getenv('STATS_REFRESH_INTERVAL_SECONDS', 60)),
+        "options": {"expires": float(os.getenv('STATS_REFRESH_INTERVAL_SECONDS', 60))},
+    },
+    # Also picks up deleted posts and comments
+    "rebuild-summary-tables": {
+        "task": "celery_app_worker.refresh_summary_tables",
+        "schedule": float(os.getenv('STATS_FULL_REFRESH_INTERVAL_SECONDS', 86400)),
+        "kwargs": {"full": True},
+    },
+}
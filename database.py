@@ -1,8 +1,17 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy import event, exc, text
+from sqlalchemy.dialects import postgresql, sqlite
+from fastapi import Request
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql import functions
 from dotenv import load_dotenv
+from functools import lru_cache
+import itertools
 import os
+import time
 
 # Load environment variables
 load_dotenv()
@@ -10,8 +19,110 @@ load_dotenv()
 # Get the database URL from environment variables
 DATABASE_URL = os.getenv('DATABASE_URL')
 
+# Engine and pool settings
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() == 'true'
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', 100))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 0))
+
+
+class PoolStats:
+    """Checkout latency and timeout counters for the connection pool."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, waited: float) -> None:
+        self.checkouts += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Measures how long each checkout waits for a free connection
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_checkout_stats.timeouts += 1
+            raise
+        pool_checkout_stats.record(time.perf_counter() - started_at)
+        return connection
+
+
+pool_checkout_stats = PoolStats()
+
+
+def engine_options(url: str) -> dict:
+    options = {"echo": DB_ECHO}
+    # SQLite (local development) keeps SQLAlchemy's default pooling
+    if url.startswith("sqlite"):
+        return options
+
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    if url.startswith("postgresql+asyncpg"):
+        connect_args = {"statement_cache_size": DB_STATEMENT_CACHE_SIZE}
+        if DB_STATEMENT_TIMEOUT_MS:
+            connect_args["server_settings"] = {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}
+        options["connect_args"] = connect_args
+    return options
+
+
+# SQLite only enforces foreign keys, and so ON DELETE CASCADE, when each connection asks for it
+def enable_sqlite_foreign_keys(db_engine) -> None:
+    if db_engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(db_engine.sync_engine, "connect")
+    def _foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+# now() defaults the timestamps on SQLite too. CURRENT_TIMESTAMP has whole seconds and a
+# shorter format than the values SQLAlchemy binds, which breaks (created_at, id) cursors.
+@compiles(functions.now, "sqlite")
+def _sqlite_now(element, compiler, **kw):
+    return "STRFTIME('%Y-%m-%d %H:%M:%f000', 'now')"
+
+
 # Create the asynchronous engine
-engine = create_async_engine(DATABASE_URL, echo=True)
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+enable_sqlite_foreign_keys(engine)
+
+
+def pool_stats() -> dict:
+    pool = engine.pool
+    stats = {
+        "checkouts": pool_checkout_stats.checkouts,
+        "timeouts": pool_checkout_stats.timeouts,
+        "wait_avg_seconds": pool_checkout_stats.wait_total / pool_checkout_stats.checkouts if pool_checkout_stats.checkouts else 0.0,
+        "wait_max_seconds": pool_checkout_stats.wait_max,
+    }
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            saturation=pool.checkedout() / (pool.size() + pool._max_overflow),
+        )
+    return stats
 
 # Session maker for async sessions
 AsyncSessionLocal = sessionmaker(
@@ -24,17 +135,145 @@ AsyncSessionLocal = sessionmaker(
 
 Base = declarative_base()
 
+# Read replica settings
+READ_REPLICA_URLS = [url.strip() for url in os.getenv('READ_REPLICA_URLS', '').split(',') if url.strip()]
+READ_REPLICA_POLICY = os.getenv('READ_REPLICA_POLICY', 'round_robin')  # or least_connections
+READ_REPLICA_RETRY_SECONDS = float(os.getenv('READ_REPLICA_RETRY_SECONDS', 30))
+READ_YOUR_WRITES_SECONDS = float(os.getenv('READ_YOUR_WRITES_SECONDS', 5))
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.engine = create_async_engine(url, **engine_options(url))
+        enable_sqlite_foreign_keys(self.engine)
+        self.sessionmaker = sessionmaker(
+            bind=self.engine,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            autocommit=False,
+            autoflush=False,
+        )
+        self.down_until = 0.0
+
+    def is_up(self) -> bool:
+        return self.down_until <= time.monotonic()
+
+    def mark_down(self) -> None:
+        self.down_until = time.monotonic() + READ_REPLICA_RETRY_SECONDS
+
+    def checked_out(self) -> int:
+        pool = self.engine.pool
+        return pool.checkedout() if isinstance(pool, QueuePool) else 0
+
+
+replicas = [Replica(url) for url in READ_REPLICA_URLS]
+_replica_counter = itertools.count()
+
+# Authorization header -> time of the last commit made with it
+_recent_writers = {}
+
+
+def record_write(writer) -> None:
+    if not writer:
+        return
+    now = time.monotonic()
+    _recent_writers[writer] = now
+    # Keep the map bounded by dropping writers outside the window
+    if len(_recent_writers) > 10000:
+        for key in [k for k, t in _recent_writers.items() if now - t > READ_YOUR_WRITES_SECONDS]:
+            del _recent_writers[key]
+
+
+def wrote_recently(writer) -> bool:
+    written_at = _recent_writers.get(writer) if writer else None
+    return written_at is not None and time.monotonic() - written_at < READ_YOUR_WRITES_SECONDS
+
+
+@event.listens_for(Session, "after_commit")
+def _record_commit(session):
+    record_write(session.info.get("writer"))
+
+
+def pick_replica():
+    candidates = [replica for replica in replicas if replica.is_up()]
+    if not candidates:
+        return None
+    if READ_REPLICA_POLICY == 'least_connections':
+        return min(candidates, key=Replica.checked_out)
+    return candidates[next(_replica_counter) % len(candidates)]
+
+
+async def open_read_session(writer=None) -> AsyncSession:
+    # Users who just wrote read from the primary so they see their own changes
+    replica = None if wrote_recently(writer) else pick_replica()
+    if replica is not None:
+        session = replica.sessionmaker()
+        try:
+            await session.connection()
+            return session
+        except (OSError, exc.DBAPIError):
+            replica.mark_down()
+            await session.close()
+    return AsyncSessionLocal()
+
 # Dependency to get the db session
-async def get_db():
+async def get_db(request: Request):
     async with AsyncSessionLocal() as session:
+        session.info["writer"] = request.headers.get("authorization")
         try:
             yield session
         finally:
             await session.close()
 
+# Dependency to get a read-only session, served by a replica when one is available
+async def get_read_db(request: Request):
+    session = await open_read_session(request.headers.get("authorization"))
+    try:
+        yield session
+    finally:
+        await session.close()
+
+# INSERT ... ON CONFLICT DO NOTHING in the dialect of the session's database
+def insert_ignore(db: AsyncSession, model):
+    dialect = postgresql if db.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(model).on_conflict_do_nothing()
+
+# Schema handling at startup:
+#   check      - compare the database's Alembic revision with the migrations head (one query, no DDL)
+#   create_all - create missing tables from the models (development only; reflects every table)
+#   skip       - do nothing
+DB_SCHEMA_MODE = os.getenv('DB_SCHEMA_MODE', 'check')
+# Set at deploy time to skip reading alembic/versions on every boot
+ALEMBIC_HEAD = os.getenv('ALEMBIC_HEAD')
+
+@lru_cache(maxsize=None)
+def alembic_head() -> str:
+    if ALEMBIC_HEAD:
+        return ALEMBIC_HEAD
+    from alembic.script import ScriptDirectory
+    return ScriptDirectory(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic")).get_current_head()
+
+async def check_schema_version() -> None:
+    async with engine.connect() as conn:
+        try:
+            current = set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars())
+        except exc.DBAPIError:
+            current = set()
+    if current != {alembic_head()}:
+        # The first migration alters an existing users table, so the migrations cannot build a new database
+        hint = "run `alembic upgrade head`" if current else (
+            "for a new database, start once with DB_SCHEMA_MODE=create_all and then run `alembic stamp head`"
+        )
+        raise RuntimeError(
+            f"Database schema is at {', '.join(sorted(current)) or 'no revision'}, expected {alembic_head()}: {hint}"
+        )
+
 # Function to initialize the database and create tables asynchronously
 async def init_db():
-    # Using `run_sync` to run the sync method `create_all` on the AsyncEngine
-    async with engine.begin() as conn:
-        # The `run_sync` method allows us to run sync methods with async engines
-        await conn.run_sync(Base.metadata.create_all)
+    if DB_SCHEMA_MODE == "check":
+        await check_schema_version()
+    elif DB_SCHEMA_MODE == "create_all":
+        # Using `run_sync` to run the sync method `create_all` on the AsyncEngine
+        async with engine.begin() as conn:
+            # The `run_sync` method allows us to run sync methods with async engines
+            await conn.run_sync(Base.metadata.create_all)
@@ -0,0 +1,31 @@
+from fastapi.responses import StreamingResponse
+from dotenv import load_dotenv
+from database import open_read_session
+import os
+
+load_dotenv()
+
+# Number of rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 1000))
+
+
+async def ndjson_rows(queries, schema):
+    # The session is opened here and not through get_read_db, because the
+    # response body is produced after the request dependencies have exited
+    async with await open_read_session() as session:
+        if session.get_bind().dialect.name == "postgresql":
+            # One snapshot for every query, so rows moving between the tables are exported once
+            await session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        for query in queries:
+            result = await session.stream_scalars(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            async for batch in result.partitions():
+                yield "".join(schema.model_validate(row, from_attributes=True).model_dump_json() + "\n" for row in batch)
+
+
+# The queries are streamed one after the other into the same file
+def ndjson_response(queries, schema, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        ndjson_rows(queries, schema),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}.ndjson"'},
+    )
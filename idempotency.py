@@ -0,0 +1,112 @@
+from fastapi import HTTPException, Request, Response, status
+from redis.exceptions import RedisError
+from dotenv import load_dotenv
+from cache import make_client
+import asyncio
+import hashlib
+import json
+import logging
+import os
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Idempotency settings. The default memory:// store only deduplicates retries
+# that reach the same process; use Redis when running several workers.
+IDEMPOTENCY_URL = os.getenv('IDEMPOTENCY_URL', 'memory://')
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 30))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 5))
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+class IdempotencyStore:
+    """Replays the stored response of a write retried with the same Idempotency-Key.
+
+    The first request holding a key takes a short-lived lock, runs the write
+    and stores its response for IDEMPOTENCY_TTL seconds. Retries get the
+    stored response back without running the write again; duplicates that
+    arrive while the first is still running wait for it to finish.
+    """
+
+    def __init__(self, client, ttl: int, lock_timeout: int, wait_seconds: float):
+        self.client = client
+        self.ttl = ttl
+        self.lock_timeout = lock_timeout
+        self.wait_seconds = wait_seconds
+        self.replayed = 0
+
+    async def _stored(self, key: str):
+        value = await self.client.get(key)
+        return json.loads(value) if value is not None else None
+
+    async def _wait(self, key: str):
+        # Poll until the request holding the lock stores its response or gives up
+        deadline = asyncio.get_running_loop().time() + self.wait_seconds
+        while asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+            stored = await self._stored(key)
+            if stored is not None or await self.client.get(f"{key}:lock") is None:
+                return stored
+        return None
+
+    async def respond(self, request: Request, scope, schema, execute, status_code: int = status.HTTP_200_OK):
+        idempotency_key = request.headers.get("idempotency-key")
+        if idempotency_key is None or self.client is None:
+            return await execute()
+        if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid Idempotency-Key")
+
+        # Keys are per user and route; the body fingerprint catches a key reused for another request
+        key = f"idempotency:{scope}:{request.method}:{request.url.path}:{idempotency_key}"
+        fingerprint = hashlib.sha256(await request.body()).hexdigest()
+        try:
+            stored = await self._stored(key)
+            if stored is None and not await self.client.set(f"{key}:lock", b"1", ex=self.lock_timeout, nx=True):
+                stored = await self._wait(key)
+                if stored is None:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="A request with this Idempotency-Key is still in progress",
+                        headers={"Retry-After": "1"},
+                    )
+        except (RedisError, OSError):
+            logger.warning("Idempotency store unavailable, running the request without it", exc_info=True)
+            return await execute()
+
+        if stored is None:
+            try:
+                # Errors of the write itself propagate; only store failures are tolerated
+                body = schema.model_validate(await execute(), from_attributes=True).model_dump_json()
+                stored = {"fingerprint": fingerprint, "status_code": status_code, "body": body}
+                try:
+                    await self.client.set(key, json.dumps(stored), ex=self.ttl)
+                except (RedisError, OSError):
+                    logger.warning("Could not store idempotent response", exc_info=True)
+            finally:
+                # Also on failure, so the client can retry the key
+                try:
+                    await self.client.delete(f"{key}:lock")
+                except (RedisError, OSError):
+                    logger.warning("Could not release idempotency lock", exc_info=True)
+            return Response(content=body, status_code=status_code, media_type="application/json")
+
+        if stored["fingerprint"] != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used for a different request",
+            )
+        self.replayed += 1
+        return Response(
+            content=stored["body"], status_code=stored["status_code"], media_type="application/json",
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    def stats(self) -> dict:
+        return {"replayed": self.replayed}
+
+
+idempotency_store = IdempotencyStore(
+    make_client(IDEMPOTENCY_URL), IDEMPOTENCY_TTL, IDEMPOTENCY_LOCK_TIMEOUT, IDEMPOTENCY_WAIT_SECONDS
+)
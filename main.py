@@ -1,23 +1,70 @@
+from startup import startup_timer  # First, so the imports below are timed
 from fastapi import FastAPI
 from fastapi.security import OAuth2PasswordBearer
+startup_timer.mark("import fastapi")
 from blog_app.users.routes import router as user_router
 from blog_app.posts.routes import router as post_router
 from blog_app.comments.routes import router as comment_router
-from database import Base, engine, init_db  # Ensure init_db is imported for async db initialization
+from blog_app.comments.stream import comment_broker
+from blog_app.notifications.outbox import run_dispatcher
+from database import Base, engine, init_db, replicas  # Ensure init_db is imported for async db initialization
+startup_timer.mark("import routes and models")
+from metrics import metrics_endpoint, metrics_middleware, setup_metrics
+from ratelimit import admission_limiter
+from profiler import SQL_PROFILER_ENABLED, instrument_engine, profiler_middleware, sql_profile_endpoint
+from dotenv import load_dotenv
+import asyncio
+import contextlib
+import os
+startup_timer.mark("import middleware")
+
+load_dotenv()
+
+# Run the outbox dispatcher inside this process (disable it where a separate dispatcher runs)
+OUTBOX_DISPATCHER_ENABLED = os.getenv('OUTBOX_DISPATCHER_ENABLED', 'true').lower() == 'true'
+# Serve the startup-time breakdown at /debug/startup (it is always logged at startup)
+STARTUP_DEBUG_ENABLED = os.getenv('STARTUP_DEBUG_ENABLED', 'false').lower() == 'true'
 
 # Function to handle lifespan events
 async def lifespan(app: FastAPI):
     # Run the database initialization on startup
     await init_db()
+    startup_timer.mark("schema check")
+    dispatcher = asyncio.create_task(run_dispatcher()) if OUTBOX_DISPATCHER_ENABLED else None
+    startup_timer.mark("start outbox dispatcher")
+    startup_timer.report()
     yield  # This ensures that FastAPI will continue running after the startup code is executed
-    # Optional: Add shutdown logic here if needed (e.g., closing DB connections)
+    await comment_broker.close()
+    if dispatcher is not None:
+        dispatcher.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await dispatcher
 
 # Create the FastAPI application with lifespan event
 app = FastAPI(lifespan=lifespan)
 
+# Shed load with 503 before the database and bcrypt pools are exhausted
+app.add_middleware(admission_limiter.middleware)
+
+# Prometheus metrics, scraped from /metrics
+setup_metrics()
+app.middleware("http")(metrics_middleware)
+app.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+# Query timing for the Prometheus histogram and the slow-query log, plus the
+# per-request SQL profiler when SQL_PROFILER_ENABLED is set
+for db_engine in [engine, *(replica.engine for replica in replicas)]:
+    instrument_engine(db_engine)
+if SQL_PROFILER_ENABLED:
+    app.middleware("http")(profiler_middleware)
+    app.add_api_route("/debug/sql-profile", sql_profile_endpoint, include_in_schema=False)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="users/login")
 
 # Include routers for users and posts
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(post_router, prefix="/posts", tags=["Posts"])
 app.include_router(comment_router, prefix="/comments", tags=["Comments"])
+if STARTUP_DEBUG_ENABLED:
+    app.add_api_route("/debug/startup", startup_timer.as_dict, include_in_schema=False)
+startup_timer.mark("app setup")
@@ -0,0 +1,100 @@
+from fastapi import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from blog_app.users.dependencies import auth_cache, hash_pool
+from blog_app.comments.stream import comment_broker
+from cache import response_cache
+from idempotency import idempotency_store
+from database import pool_stats, replicas
+from ratelimit import admission_limiter, rate_limiter
+from startup import startup_timer
+import time
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served", ["method"])
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ["statement"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+CELERY_ENQUEUE_LATENCY = Histogram(
+    "celery_enqueue_duration_seconds", "Time spent publishing a batch of tasks to the broker"
+)
+
+
+async def metrics_middleware(request: Request, call_next):
+    in_flight = REQUESTS_IN_FLIGHT.labels(request.method)
+    in_flight.inc()
+    started_at = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by the route template (/posts/{post_id}), not the raw path, to keep cardinality bounded
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method, route.path if route is not None else "unmatched", str(status_code)
+        ).observe(time.perf_counter() - started_at)
+        in_flight.dec()
+
+
+def observe_query(statement: str, duration: float) -> None:
+    # Called from profiler.instrument_engine, the one timing listener on each engine
+    kind = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+    DB_QUERY_DURATION.labels(kind).observe(duration)
+
+
+class StatsCollector:
+    """Exposes the in-process pool and cache counters at scrape time."""
+
+    def collect(self):
+        stats = pool_stats()
+        yield CounterMetricFamily("db_pool_checkouts", "Connection pool checkouts", value=stats["checkouts"])
+        yield CounterMetricFamily("db_pool_timeouts", "Connection pool checkout timeouts", value=stats["timeouts"])
+        yield GaugeMetricFamily("db_pool_checkout_wait_max_seconds", "Longest pool checkout wait", value=stats["wait_max_seconds"])
+        for key in ("size", "checked_out", "overflow", "saturation"):
+            if key in stats:
+                yield GaugeMetricFamily(f"db_pool_{key}", f"Connection pool {key.replace('_', ' ')}", value=stats[key])
+
+        replica_up = GaugeMetricFamily("db_replica_up", "Whether a read replica is in rotation", labels=["replica"])
+        for index, replica in enumerate(replicas):
+            replica_up.add_metric([str(index)], float(replica.is_up()))
+        yield replica_up
+
+        stats = hash_pool.stats()
+        yield GaugeMetricFamily("password_hash_pending", "Queued and running bcrypt jobs", value=stats["pending"])
+        yield CounterMetricFamily("password_hash_completed", "Finished bcrypt jobs", value=stats["completed"])
+        yield CounterMetricFamily("password_hash_rejected", "bcrypt jobs rejected with 429", value=stats["rejected"])
+        yield GaugeMetricFamily("password_hash_wait_avg_seconds", "Average bcrypt pool wait", value=stats["wait_avg_seconds"])
+        yield GaugeMetricFamily("password_hash_wait_max_seconds", "Longest bcrypt pool wait", value=stats["wait_max_seconds"])
+
+        for name, cache_stats in (("auth", auth_cache.stats()), ("response", response_cache.stats())):
+            yield CounterMetricFamily(f"{name}_cache_hits", f"{name.title()} cache hits", value=cache_stats["hits"])
+            yield CounterMetricFamily(f"{name}_cache_misses", f"{name.title()} cache misses", value=cache_stats["misses"])
+
+        yield CounterMetricFamily("idempotent_replays", "Writes answered from the idempotency store", value=idempotency_store.stats()["replayed"])
+        yield CounterMetricFamily("rate_limited_requests", "Requests rejected with 429 by a route rate limit", value=rate_limiter.stats()["limited"])
+        stats = admission_limiter.stats()
+        yield GaugeMetricFamily("admission_in_flight", "Requests holding an admission slot", value=stats["in_flight"])
+        yield CounterMetricFamily("admission_shed_requests", "Requests shed with 503 by admission control", value=stats["shed"])
+
+        startup = GaugeMetricFamily("app_startup_phase_seconds", "Time spent in each startup phase", labels=["phase"])
+        for phase, seconds in startup_timer.phases:
+            startup.add_metric([phase], seconds)
+        yield startup
+
+        stats = comment_broker.stats()
+        yield GaugeMetricFamily("comment_stream_subscribers", "Open live comment streams", value=stats["subscribers"])
+        yield CounterMetricFamily("comment_stream_events", "Comment events delivered to streams", value=stats["delivered"])
+        yield CounterMetricFamily("comment_stream_evictions", "Streams closed for falling behind", value=stats["evicted"])
+
+
+def setup_metrics() -> None:
+    REGISTRY.register(StatsCollector())
+
+
+async def metrics_endpoint():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
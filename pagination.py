@@ -0,0 +1,126 @@
+import base64
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import func, select, tuple_
+from dotenv import load_dotenv
+import orjson
+import os
+
+load_dotenv()
+
+# Page size limits shared by all listing endpoints
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Serve listings from plain row tuples encoded with orjson, skipping ORM
+# entities and per-item response model validation
+FAST_JSON_RESPONSES = os.getenv('FAST_JSON_RESPONSES', 'false').lower() == 'true'
+
+
+def _encode(value: str, row_id: int) -> str:
+    raw = f"{value}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return value, int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    return _encode(created_at.isoformat(), row_id)
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    value, row_id = _decode(cursor)
+    try:
+        return datetime.fromisoformat(value), row_id
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+# Cursors for result lists ordered by (rank, id), e.g. search results
+def encode_rank_cursor(rank: float, row_id: int) -> str:
+    return _encode(repr(rank), row_id)
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[float, int]:
+    value, row_id = _decode(cursor)
+    try:
+        return float(value), row_id
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def as_utc(value: datetime) -> datetime:
+    # Naive timestamps in query parameters are taken to be UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+# Keyset pagination on (created_at, id), newest first. The composite
+# (created_at, id) indexes let the database seek straight to the cursor,
+# so deep pages cost the same as the first one. since/until restrict the
+# page to created_at in [since, until) and use the same indexes.
+def paginate(query, model, cursor: Optional[str], limit: int,
+             since: Optional[datetime] = None, until: Optional[datetime] = None):
+    if since and until and as_utc(since) >= as_utc(until):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be before until")
+    if since:
+        query = query.filter(model.created_at >= as_utc(since))
+    if until:
+        query = query.filter(model.created_at < as_utc(until))
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    # Fetch one extra row to know whether another page exists
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+
+
+def build_page(rows: List[Any], limit: int) -> dict:
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# Only the columns a response schema needs, for select(*columns_for(...))
+def columns_for(model, schema) -> list:
+    return [getattr(model, name) for name in schema.model_fields]
+
+
+# UTC timestamps (timestamptz columns on Postgres) end in "Z", as pydantic renders them
+def page_json(rows: List[Any], limit: int) -> bytes:
+    page = build_page(rows, limit)
+    return orjson.dumps(
+        {"items": [row._asdict() for row in page["items"]], "next_cursor": page["next_cursor"]},
+        option=orjson.OPT_UTC_Z,
+    )
+
+
+# Keyset-ordered first page of children for several parents in one query.
+# Rows are ranked per parent with ROW_NUMBER() and only the first limit + 1
+# of each parent are returned, so build_page can still detect a next page.
+def first_pages(query, model, parent_column, parent_ids, limit: int):
+    ranked = (
+        select(
+            model.id.label("id"),
+            func.row_number().over(
+                partition_by=parent_column,
+                order_by=(model.created_at.desc(), model.id.desc()),
+            ).label("rank"),
+        )
+        .filter(parent_column.in_(parent_ids))
+        .subquery()
+    )
+    return (
+        query.join(ranked, model.id == ranked.c.id)
+        .filter(ranked.c.rank <= limit + 1)
+        .order_by(model.created_at.desc(), model.id.desc())
+    )
@@ -0,0 +1,142 @@
+from collections import deque
+from contextvars import ContextVar
+from fastapi import Request
+from sqlalchemy import event
+from dotenv import load_dotenv
+from metrics import observe_query
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+
+load_dotenv()
+
+slow_query_logger = logging.getLogger("slow_query")
+
+# Profiler settings
+SQL_PROFILER_ENABLED = os.getenv('SQL_PROFILER_ENABLED', 'false').lower() == 'true'
+SQL_PROFILE_TOP_N = int(os.getenv('SQL_PROFILE_TOP_N', 5))
+SQL_PROFILE_HISTORY = int(os.getenv('SQL_PROFILE_HISTORY', 100))
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 200))
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'false').lower() == 'true'
+# EXPLAINs running at once; slow queries beyond that are logged without a plan
+SLOW_QUERY_EXPLAIN_CONCURRENCY = int(os.getenv('SLOW_QUERY_EXPLAIN_CONCURRENCY', 1))
+# Each distinct statement is explained at most once per interval
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = float(os.getenv('SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS', 600))
+SLOW_QUERY_EXPLAIN_MAX_STATEMENTS = 1000
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.query_count = 0
+        self.db_time = 0.0
+        self._slowest = []  # min-heap of (duration, order, statement)
+
+    def record(self, statement: str, duration: float) -> None:
+        self.query_count += 1
+        self.db_time += duration
+        entry = (duration, self.query_count, statement)
+        if len(self._slowest) < SQL_PROFILE_TOP_N:
+            heapq.heappush(self._slowest, entry)
+        else:
+            heapq.heappushpop(self._slowest, entry)
+
+    def as_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "query_count": self.query_count,
+            "db_time_ms": round(self.db_time * 1000, 3),
+            "slowest": [
+                {"duration_ms": round(duration * 1000, 3), "statement": statement}
+                for duration, _, statement in sorted(self._slowest, reverse=True)
+            ],
+        }
+
+
+_current_profile = ContextVar("sql_profile", default=None)
+recent_profiles = deque(maxlen=SQL_PROFILE_HISTORY)
+_background_tasks = set()  # running EXPLAINs
+_explained_at = {}  # statement -> time of its last EXPLAIN, oldest first
+
+
+async def profiler_middleware(request: Request, call_next):
+    profile = RequestProfile(request.method, request.url.path)
+    token = _current_profile.set(profile)
+    try:
+        response = await call_next(request)
+    finally:
+        _current_profile.reset(token)
+    recent_profiles.append(profile)
+    db_time_ms = round(profile.db_time * 1000, 3)
+    response.headers["X-DB-Query-Count"] = str(profile.query_count)
+    response.headers["X-DB-Time-Ms"] = str(db_time_ms)
+    response.headers["Server-Timing"] = f"db;dur={db_time_ms}"
+    return response
+
+
+def _should_explain(statement: str) -> bool:
+    # A slow statement tends to be slow many times over, each EXPLAIN takes a pool
+    # connection, and EXPLAIN on Postgres plans the statement once more
+    if not SLOW_QUERY_EXPLAIN or not statement.lstrip().upper().startswith("SELECT"):
+        return False
+    if len(_background_tasks) >= SLOW_QUERY_EXPLAIN_CONCURRENCY:
+        return False
+    now = time.monotonic()
+    explained_at = _explained_at.pop(statement, None)
+    if explained_at is not None and now - explained_at < SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+        _explained_at[statement] = explained_at
+        return False
+    _explained_at[statement] = now
+    if len(_explained_at) > SLOW_QUERY_EXPLAIN_MAX_STATEMENTS:
+        del _explained_at[next(iter(_explained_at))]
+    return True
+
+
+async def _explain_slow_query(async_engine, record: dict, parameters) -> None:
+    # The EXPLAIN must not count towards the profile of the request that triggered it
+    _current_profile.set(None)
+    explain = "EXPLAIN QUERY PLAN " if async_engine.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        # Runs on its own connection, so the request that ran the query is not held up
+        async with async_engine.connect() as conn:
+            result = await conn.exec_driver_sql(explain + record["statement"], parameters)
+            record["plan"] = [" ".join(str(value) for value in row) for row in result.all()]
+    except Exception as exc:
+        record["plan_error"] = str(exc)
+    slow_query_logger.warning(json.dumps(record))
+
+
+def instrument_engine(async_engine) -> None:
+    # One timing listener per engine feeds the Prometheus histogram, the per-request
+    # profile and the slow-query log
+    sync_engine = async_engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_started_at = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context._query_started_at
+        observe_query(statement, duration)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(statement, duration)
+        if duration * 1000 >= SLOW_QUERY_THRESHOLD_MS and not executemany and not statement.lstrip().upper().startswith("EXPLAIN"):
+            record = {"duration_ms": round(duration * 1000, 3), "statement": statement}
+            if not _should_explain(statement):
+                slow_query_logger.warning(json.dumps(record))
+                return
+            task = asyncio.get_running_loop().create_task(_explain_slow_query(async_engine, record, parameters))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+
+
+async def sql_profile_endpoint():
+    # Most recent requests first
+    return [profile.as_dict() for profile in reversed(recent_profiles)]
@@ -0,0 +1,227 @@
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from dotenv import load_dotenv
+from blog_app.users.dependencies import verify_access_token
+from database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+import asyncio
+import logging
+import math
+import os
+import time
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rate limit settings. Leave RATE_LIMIT_URL unset (or memory://) for per-process
+# buckets, or point it at Redis to share the buckets between workers.
+# Each route limit can be overridden with RATE_LIMIT_<NAME>, e.g. RATE_LIMIT_LOGIN=10/minute
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_URL = os.getenv('RATE_LIMIT_URL')
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+RATE_LIMIT_TRUST_FORWARDED = os.getenv('RATE_LIMIT_TRUST_FORWARDED', 'false').lower() == 'true'
+
+# Admission control settings. Requests beyond ADMISSION_MAX_IN_FLIGHT wait up to
+# ADMISSION_QUEUE_TIMEOUT seconds for a slot, then get a 503. 0 disables it.
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', DB_POOL_SIZE + DB_MAX_OVERFLOW))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 0.5))
+ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 1))
+ADMISSION_EXEMPT_PATHS = ("/metrics",)
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+# "10/minute" or "10/30" (seconds) -> (10, 60.0)
+def parse_rate(rate: str) -> tuple:
+    count, _, period = rate.partition("/")
+    period = period.strip()
+    seconds = PERIODS[period] if period in PERIODS else float(period)
+    return int(count), float(seconds)
+
+
+class MemoryBuckets:
+    """Per-process token buckets, bounded to the most recently used keys."""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()  # key -> (tokens, updated_at)
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        now = time.monotonic()
+        tokens, updated_at = self.buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated_at) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return retry_after
+
+
+# Refill and take in one round trip. The clock is Redis' own, so workers
+# with skewed clocks still agree on the bucket state.
+TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local retry_after = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    retry_after = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated_at', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(retry_after)
+"""
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker through Redis."""
+
+    def __init__(self, client: Redis):
+        self.script = client.register_script(TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: int, rate: float) -> float:
+        try:
+            return float(await self.script(keys=[key], args=[capacity, rate]))
+        except (RedisError, OSError):
+            # Fail open: an unavailable limiter must not take the API down with it
+            logger.warning("Rate limiter unavailable, letting the request through", exc_info=True)
+            return 0.0
+
+
+def make_backend(url):
+    if not url or url.startswith("memory://"):
+        return MemoryBuckets(RATE_LIMIT_MAX_KEYS)
+    return RedisBuckets(Redis.from_url(url))
+
+
+def client_ip(request: Request) -> str:
+    forwarded = request.headers.get("x-forwarded-for")
+    if RATE_LIMIT_TRUST_FORWARDED and forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def token_subject(request: Request):
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    payload = verify_access_token(token)
+    return payload.get("sub") if payload else None
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self.limited = 0
+
+    def limit(self, name: str, default: str, key: str = "ip"):
+        """Route dependency allowing `default` requests per period per client.
+
+        key="user" buckets by JWT subject and falls back to the client IP for
+        requests without a valid token; key="ip" always uses the IP.
+        """
+        capacity, period = parse_rate(os.getenv(f'RATE_LIMIT_{name.upper()}', default))
+        rate = capacity / period
+
+        async def dependency(request: Request):
+            if not RATE_LIMIT_ENABLED or capacity <= 0:
+                return
+            subject = token_subject(request) if key == "user" else None
+            identity = f"user:{subject}" if subject else f"ip:{client_ip(request)}"
+            retry_after = await self.backend.take(f"ratelimit:{name}:{identity}", capacity, rate)
+            if retry_after > 0:
+                self.limited += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Rate limit exceeded, retry later",
+                    headers={"Retry-After": str(math.ceil(retry_after))},
+                )
+
+        return Depends(dependency)
+
+    def stats(self) -> dict:
+        return {"limited": self.limited}
+
+
+rate_limiter = RateLimiter(make_backend(RATE_LIMIT_URL))
+
+
+class AdmissionLimiter:
+    """Caps requests in flight so overload is shed early with a 503.
+
+    The default cap is the size of the database pool including overflow:
+    beyond that, extra requests would only queue for a connection until
+    DB_POOL_TIMEOUT and fail anyway, holding memory and bcrypt slots meanwhile.
+    """
+
+    def __init__(self, max_in_flight: int, queue_timeout: float):
+        self.max_in_flight = max_in_flight
+        self.queue_timeout = queue_timeout
+        self.semaphore = asyncio.Semaphore(max_in_flight) if max_in_flight > 0 else None
+        self.in_flight = 0
+        self.shed = 0
+
+    def middleware(self, app):
+        # Pure ASGI rather than app.middleware("http"), which lets go once the response
+        # headers are out: the slot is held until the last body chunk is sent, so a
+        # streamed export counts against the cap for as long as it holds a connection
+        async def admit(scope, receive, send):
+            if self.semaphore is None or scope["type"] != "http" or scope["path"] in ADMISSION_EXEMPT_PATHS:
+                await app(scope, receive, send)
+                return
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                response = JSONResponse(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    content={"detail": "Server is busy, retry later"},
+                    headers={"Retry-After": str(ADMISSION_RETRY_AFTER)},
+                )
+                await response(scope, receive, send)
+                return
+
+            self.in_flight += 1
+            released = False
+
+            def release():
+                nonlocal released
+                if not released:
+                    released = True
+                    self.in_flight -= 1
+                    self.semaphore.release()
+
+            async def send_and_release(message):
+                try:
+                    await send(message)
+                finally:
+                    if message["type"] == "http.response.body" and not message.get("more_body", False):
+                        release()
+
+            try:
+                await app(scope, receive, send_and_release)
+            finally:
+                # Errors, and clients that disconnected before the last chunk
+                release()
+
+        return admit
+
+    def stats(self) -> dict:
+        return {"max_in_flight": self.max_in_flight, "in_flight": self.in_flight, "shed": self.shed}
+
+
+admission_limiter = AdmissionLimiter(ADMISSION_MAX_IN_FLIGHT, ADMISSION_QUEUE_TIMEOUT)
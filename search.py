@@ -0,0 +1,121 @@
+from collections import Counter, defaultdict
+from sqlalchemy import event, func, literal_column, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session
+from typing import Optional
+from pagination import encode_rank_cursor, decode_rank_cursor
+from blog_app.posts.models import Post
+from blog_app.comments.models import Comment
+import re
+
+# Text search configuration used by the generated tsvector columns
+SEARCH_CONFIG = 'english'
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list:
+    return _TOKEN.findall(text.lower())
+
+
+class InvertedIndex:
+    """In-process inverted index used when the database has no full-text search (SQLite).
+
+    The index is rebuilt from the table on the first search after a commit
+    touched the model, which keeps it simple and correct for development and
+    test databases.
+    """
+
+    def __init__(self, model, *columns):
+        self.model = model
+        self.columns = columns
+        self.postings = defaultdict(dict)  # token -> {row id: term frequency}
+        self.stale = True
+
+    async def rebuild(self, db: AsyncSession) -> None:
+        self.stale = False
+        postings = defaultdict(dict)
+        result = await db.execute(select(self.model.id, *self.columns))
+        for row_id, *values in result.all():
+            for token, count in Counter(tokenize(" ".join(value or "" for value in values))).items():
+                postings[token][row_id] = count
+        self.postings = postings
+
+    async def search(self, db: AsyncSession, q: str) -> list:
+        if self.stale:
+            await self.rebuild(db)
+        tokens = set(tokenize(q))
+        if not tokens:
+            return []
+        # Every term must match, like websearch_to_tsquery without operators
+        matches = set.intersection(*(set(self.postings.get(token, ())) for token in tokens))
+        ranked = [(float(sum(self.postings[token][row_id] for token in tokens)), row_id) for row_id in matches]
+        return sorted(ranked, reverse=True)
+
+
+_indexes = {
+    Post: InvertedIndex(Post, Post.title, Post.content),
+    Comment: InvertedIndex(Comment, Comment.content),
+}
+
+
+# Track which indexed models a session wrote to, and mark those indexes
+# stale once the transaction commits.
+@event.listens_for(Session, "after_flush")
+def _track_flush(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if type(obj) in _indexes:
+            session.info.setdefault("search_written", set()).add(type(obj))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ in _indexes:
+            orm_execute_state.session.info.setdefault("search_written", set()).add(mapper.class_)
+            # Deleted posts take their comments with them (ON DELETE CASCADE)
+            if mapper.class_ is Post and orm_execute_state.is_delete:
+                orm_execute_state.session.info["search_written"].add(Comment)
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_stale(session):
+    for model in session.info.pop("search_written", ()):
+        _indexes[model].stale = True
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("search_written", None)
+
+
+# Ranked full-text search over model, keyset paginated on (rank, id).
+# Returns a list of (row, rank) pairs and the cursor of the next page.
+async def search(db: AsyncSession, model, q: str, cursor: Optional[str], limit: int):
+    if db.get_bind().dialect.name == "postgresql":
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+        vector = literal_column(f"{model.__tablename__}.search_vector")
+        rank = func.ts_rank(vector, tsquery)
+        query = select(model, rank.label("rank")).filter(vector.op("@@")(tsquery))
+        if cursor:
+            query = query.filter(tuple_(rank, model.id) < tuple_(*decode_rank_cursor(cursor)))
+        result = await db.execute(query.order_by(rank.desc(), model.id.desc()).limit(limit + 1))
+        rows = [(row, row_rank) for row, row_rank in result.all()]
+    else:
+        ranked = await _indexes[model].search(db, q)
+        if cursor:
+            after = decode_rank_cursor(cursor)
+            ranked = [entry for entry in ranked if entry < after]
+        ranked = ranked[:limit + 1]
+        result = await db.execute(select(model).filter(model.id.in_([row_id for _, row_id in ranked])))
+        by_id = {row.id: row for row in result.scalars().all()}
+        rows = [(by_id[row_id], rank) for rank, row_id in ranked if row_id in by_id]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, last_rank = rows[-1]
+        next_cursor = encode_rank_cursor(last_rank, last.id)
+    return rows, next_cursor
@@ -0,0 +1,36 @@
+import logging
+import time
+
+# A child of uvicorn's logger, so the report shows up with uvicorn's own startup lines
+logger = logging.getLogger("uvicorn.error.startup")
+
+
+class StartupTimer:
+    """Records how long each phase of booting the app takes."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.last = self.started_at
+        self.phases = []  # (phase, seconds)
+
+    def mark(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def total(self) -> float:
+        return self.last - self.started_at
+
+    def report(self) -> None:
+        breakdown = ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.phases)
+        logger.info("Started in %.0f ms: %s", self.total() * 1000, breakdown)
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total() * 1000, 3),
+            "phases": [{"phase": phase, "ms": round(seconds * 1000, 3)} for phase, seconds in self.phases],
+        }
+
+
+# Created when main.py starts importing, so the import phases are measured too
+startup_timer = StartupTimer()
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its settings at import time
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["RESPONSE_CACHE_URL"] = "memory://"
+os.environ["DB_SCHEMA_MODE"] = "skip"  # each test creates its own tables
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("REDIS_BROKER", "memory://")
+os.environ.setdefault("REDIS_BACKEND", "cache+memory://")
+os.environ.setdefault("OUTBOX_DISPATCHER_ENABLED", "false")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("ADMISSION_MAX_IN_FLIGHT", "0")
+
+import httpx
+import pytest
+from sqlalchemy import event, insert
+from blog_app.users.dependencies import create_access_token
+from blog_app.users.models import User
+from blog_app.posts.models import Post
+from blog_app.posts import counters
+from blog_app.comments.models import Comment
+from cache import response_cache
+from database import Base, engine
+from main import app
+
+
+class StatementCounter:
+    """Counts the statements sent to the database."""
+
+    def __init__(self, async_engine):
+        self.count = 0
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+statements = StatementCounter(engine)
+
+
+async def seed(posts: int, comments_per_post: int, days_old: float = 0) -> None:
+    # With days_old, rows are backdated and a second apart in insertion order
+    start = datetime.now(timezone.utc) - timedelta(days=days_old)
+
+    def created_at(i):
+        return {"created_at": start + timedelta(seconds=i)} if days_old else {}
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(insert(User), [
+            {"username": "author", "email": "author@example.com", "hashed_password": "x", "age": 30}
+        ])
+        if posts:
+            await conn.execute(insert(Post), [
+                {"user_id": 1, "title": f"Post {i}", "content": "test", **created_at(i)} for i in range(posts)
+            ])
+        if posts and comments_per_post:
+            await conn.execute(insert(Comment), [
+                {"user_id": 1, "post_id": post_id, "content": f"Comment {i}", **created_at(posts + i)}
+                for post_id in range(1, posts + 1) for i in range(comments_per_post)
+            ])
+        await conn.execute(counters.recount_comments())
+    # Seeding bypasses the routes that invalidate cached pages
+    await response_cache.client.flushall()
+
+
+async def _request(method: str, path: str, **kwargs):
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        before = statements.count
+        response = await client.request(method, path, **kwargs)
+        return response, statements.count - before
+
+
+@pytest.fixture
+def request_app():
+    """Sends one request and returns the response and the statements it ran."""
+    return lambda method, path, **kwargs: asyncio.run(_request(method, path, **kwargs))
+
+
+@pytest.fixture
+def seeded():
+    return lambda posts, comments_per_post=0, days_old=0: asyncio.run(seed(posts, comments_per_post, days_old))
+
+
+@pytest.fixture
+def auth_headers():
+    return {"Authorization": f"Bearer {create_access_token({'sub': 'author'})}"}
@@ -0,0 +1,60 @@
+"""Admission control holds a slot until a streamed response has been sent in full."""
+import asyncio
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from ratelimit import AdmissionLimiter
+
+
+def streaming_app(limiter: AdmissionLimiter, seen: list, release: asyncio.Event) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(limiter.middleware)
+
+    @app.get("/export")
+    async def export():
+        async def chunks():
+            for chunk in ("a", "b", "c"):
+                seen.append(limiter.in_flight)
+                yield chunk
+                await release.wait()
+        return StreamingResponse(chunks())
+
+    @app.get("/fail")
+    async def fail():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def test_slot_is_held_while_the_body_streams():
+    async def scenario():
+        limiter, seen, release = AdmissionLimiter(1, 0.05), [], asyncio.Event()
+        app = streaming_app(limiter, seen, release)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            export = asyncio.create_task(client.get("/export"))
+            while not seen:
+                await asyncio.sleep(0.01)
+            # Headers and the first chunk are out, the body is not finished
+            shed = await client.get("/export")
+            release.set()
+            response = await export
+        return limiter, seen, shed, response
+
+    limiter, seen, shed, response = asyncio.run(scenario())
+    assert response.text == "abc" and seen == [1, 1, 1]
+    assert shed.status_code == 503 and shed.headers["Retry-After"]
+    assert limiter.stats() == {"max_in_flight": 1, "in_flight": 0, "shed": 1}
+
+
+def test_slot_is_released_when_the_app_raises():
+    async def scenario():
+        limiter = AdmissionLimiter(1, 0.05)
+        app = streaming_app(limiter, [], asyncio.Event())
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statuses = [(await client.get("/fail")).status_code for _ in range(2)]
+        return limiter, statuses
+
+    limiter, statuses = asyncio.run(scenario())
+    assert statuses == [500, 500]
+    assert limiter.in_flight == 0 and limiter.shed == 0
@@ -0,0 +1,93 @@
+"""Comments moved to comments_archive stay reachable through the post routes and the export."""
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.future import select
+from blog_app.comments.archive import archive_comments
+from blog_app.comments.models import CommentArchive
+from database import engine
+
+
+def archive(cutoff_days: float = 0) -> int:
+    async def run():
+        async with engine.connect() as conn:
+            return await archive_comments(conn, datetime.now(timezone.utc) - timedelta(days=cutoff_days), batch_size=2)
+
+    return asyncio.run(run())
+
+
+def test_export_includes_archived_comments(seeded, request_app, auth_headers):
+    seeded(posts=1, comments_per_post=3, days_old=400)
+    assert archive(cutoff_days=1) == 3
+    assert request_app("POST", "/comments/", json={"post_id": 1, "content": "Live"}, headers=auth_headers)[0].status_code == 201
+
+    response, _ = request_app("GET", "/comments/export")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    # Live comments first, then the archive, each by id
+    assert [(row["id"], row["content"]) for row in rows] == [(4, "Live"), (1, "Comment 0"), (2, "Comment 1"), (3, "Comment 2")]
+    assert set(rows[0]) == {"id", "user_id", "post_id", "content", "created_at"}
+
+
+def archive_oldest(posts: int, comments_per_post: int) -> int:
+    # Seeded comments are a second apart per post; archive the first comments_per_post of each
+    return archive(cutoff_days=400 - (posts + comments_per_post - 0.5) / 86400)
+
+
+def comment_contents(comments: list) -> list:
+    return [comment["content"] for comment in comments]
+
+
+def test_get_post_pages_continue_into_the_archive(seeded, request_app):
+    seeded(posts=2, comments_per_post=4, days_old=400)
+    assert archive_oldest(posts=2, comments_per_post=2) == 4
+
+    response, _ = request_app("GET", "/posts/1", params={"comments_limit": 3})
+    # The first page already spans the live comments and the archive
+    assert comment_contents(response.json()["comments"]) == ["Comment 3", "Comment 2", "Comment 1"]
+
+    pages, cursor = [], None
+    while True:
+        params = {"comments_limit": 1, **({"comments_cursor": cursor} if cursor else {})}
+        body = request_app("GET", "/posts/1", params=params)[0].json()
+        pages.append(comment_contents(body["comments"]))
+        assert all(comment["post_id"] == 1 for comment in body["comments"])
+        cursor = body["next_comments_cursor"]
+        if cursor is None:
+            break
+    assert [content for page in pages for content in page] == ["Comment 3", "Comment 2", "Comment 1", "Comment 0"]
+
+
+def test_get_posts_by_ids_pages_continue_into_the_archive(seeded, request_app):
+    seeded(posts=2, comments_per_post=4, days_old=400)
+    assert archive_oldest(posts=2, comments_per_post=2) == 4
+
+    response, _ = request_app("GET", "/posts/batch", params={"ids": "1,2", "comments_limit": 3})
+    posts = response.json()
+    assert [post["id"] for post in posts] == [1, 2]
+    for post in posts:
+        assert comment_contents(post["comments"]) == ["Comment 3", "Comment 2", "Comment 1"]
+        assert all(comment["post_id"] == post["id"] for comment in post["comments"])
+        assert post["next_comments_cursor"] is not None
+
+    # The cursor of the short page picks up in the archive
+    response, _ = request_app("GET", "/posts/2", params={"comments_limit": 3, "comments_cursor": posts[1]["next_comments_cursor"]})
+    assert comment_contents(response.json()["comments"]) == ["Comment 0"]
+
+
+def archived_post_ids() -> list:
+    async def run():
+        async with engine.connect() as conn:
+            return (await conn.execute(select(CommentArchive.post_id).order_by(CommentArchive.id))).scalars().all()
+
+    return asyncio.run(run())
+
+
+def test_post_deletes_cascade_into_the_archive(seeded, request_app, auth_headers):
+    seeded(posts=3, comments_per_post=2, days_old=400)
+    assert archive(cutoff_days=1) == 6
+
+    assert request_app("DELETE", "/posts/1", headers=auth_headers)[0].status_code == 200
+    assert archived_post_ids() == [2, 2, 3, 3]
+    response, _ = request_app("DELETE", "/posts/batch", json={"ids": [2]}, headers=auth_headers)
+    assert response.json()["deleted"] == [2]
+    assert archived_post_ids() == [3, 3]
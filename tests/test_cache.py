@@ -0,0 +1,60 @@
+"""The in-memory Redis stand-in and the response cache on top of it."""
+import asyncio
+import time
+from blog_app.users.dependencies import create_access_token
+from cache import MemoryRedis, response_cache
+
+
+def test_memory_redis_expires_and_evicts_oldest_keys():
+    async def scenario():
+        redis = MemoryRedis(max_keys=3, sweep_seconds=0)
+        await redis.set("short", "1", ex=0.01)
+        await asyncio.sleep(0.02)
+        assert await redis.get("short") is None
+        for key in ("a", "b", "c", "d"):
+            await redis.set(key, key)
+        assert await redis.get("a") is None
+        assert [await redis.get(key) for key in ("b", "c", "d")] == [b"b", b"c", b"d"]
+        assert await redis.set("d", "again", nx=True) is None
+        assert await redis.incr("counter") == 1
+        assert len(redis._data) == 3
+
+    asyncio.run(scenario())
+
+
+def test_memory_redis_sweeps_keys_never_read_again():
+    async def scenario():
+        redis = MemoryRedis(sweep_seconds=0.01)
+        for i in range(100):
+            await redis.set(f"idempotency:{i}", "{}", ex=0.01)
+        time.sleep(0.02)
+        await redis.set("fresh", "1")
+        assert list(redis._data) == ["fresh"]
+
+    asyncio.run(scenario())
+
+
+def test_cached_listing_hits_skip_the_database(seeded, request_app):
+    seeded(posts=3)
+    first, first_count = request_app("GET", "/posts/")
+    second, second_count = request_app("GET", "/posts/")
+    assert first_count > 0 and second_count == 0
+    assert first.content == second.content
+    assert request_app("GET", "/posts/", headers={"If-None-Match": first.headers["etag"]})[0].status_code == 304
+
+
+def test_writes_invalidate_and_writers_bypass_the_cache(seeded, request_app):
+    seeded(posts=3)
+    headers = {"Authorization": f"Bearer {create_access_token({'sub': 'author'})}"}
+    request_app("GET", "/posts/")
+    hits = response_cache.hits
+
+    created, _ = request_app("POST", "/posts/", json={"title": "New", "content": "test"}, headers=headers)
+    assert created.status_code == 200
+    listing, count = request_app("GET", "/posts/")
+    assert listing.json()["items"][0]["title"] == "New" and count > 0
+
+    # Anonymous readers now hit the refilled page; the writer reads through to the database
+    assert request_app("GET", "/posts/")[1] == 0
+    assert request_app("GET", "/posts/", headers=headers)[1] > 0
+    assert response_cache.hits == hits + 1
@@ -0,0 +1,90 @@
+"""Writes retried with the same Idempotency-Key run once and replay the first response."""
+import asyncio
+import httpx
+from fastapi import FastAPI, HTTPException, Request, status
+from pydantic import BaseModel
+from cache import make_client
+from idempotency import IdempotencyStore
+
+
+class Item(BaseModel):
+    id: int
+    name: str
+
+
+def counting_app(store: IdempotencyStore, runs: list, fail_first: bool = False) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/items")
+    async def create_item(item: Item, request: Request):
+        async def execute():
+            runs.append(item.name)
+            # Long enough for a duplicate to arrive while the lock is held
+            await asyncio.sleep(0.1)
+            if fail_first and len(runs) == 1:
+                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Try again")
+            return {"id": len(runs), "name": item.name}
+
+        return await store.respond(request, "user", Item, execute)
+
+    return app
+
+
+async def send(app: FastAPI, requests: list) -> list:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        return [await client.post("/items", json=body, headers={"Idempotency-Key": key}) for key, body in requests]
+
+
+def new_store() -> IdempotencyStore:
+    return IdempotencyStore(make_client("memory://"), ttl=60, lock_timeout=30, wait_seconds=5)
+
+
+def test_concurrent_duplicates_run_once():
+    store, runs = new_store(), []
+    app = counting_app(store, runs)
+
+    async def duplicates():
+        return await asyncio.gather(*(send(app, [("k", {"id": 0, "name": "a"})]) for _ in range(3)))
+
+    responses = [response for batch in asyncio.run(duplicates()) for response in batch]
+    assert runs == ["a"]
+    assert [response.json() for response in responses] == [{"id": 1, "name": "a"}] * 3
+    assert sorted(response.headers.get("Idempotent-Replayed", "") for response in responses) == ["", "true", "true"]
+
+
+def test_replay_and_reused_key():
+    store, runs = new_store(), []
+    first, replay, reused, other = asyncio.run(send(counting_app(store, runs), [
+        ("k", {"id": 0, "name": "a"}),
+        ("k", {"id": 0, "name": "a"}),
+        ("k", {"id": 0, "name": "b"}),
+        ("k2", {"id": 0, "name": "b"}),
+    ]))
+    assert runs == ["a", "b"]
+    assert "Idempotent-Replayed" not in first.headers
+    assert replay.headers["Idempotent-Replayed"] == "true" and replay.json() == first.json()
+    assert reused.status_code == 422
+    assert other.status_code == 200 and "Idempotent-Replayed" not in other.headers
+    assert store.stats() == {"replayed": 1}
+
+
+def test_lock_is_released_when_the_write_fails():
+    store, runs = new_store(), []
+    failed, retried = asyncio.run(send(counting_app(store, runs, fail_first=True), [
+        ("k", {"id": 0, "name": "a"}),
+        ("k", {"id": 0, "name": "a"}),
+    ]))
+    assert failed.status_code == 503
+    # The retry runs the write again instead of waiting out the lock or replaying the error
+    assert retried.status_code == 200 and "Idempotent-Replayed" not in retried.headers
+    assert runs == ["a", "a"]
+    assert asyncio.run(store.client.get("idempotency:user:POST:/items:k:lock")) is None
+
+
+def test_post_route_replays(seeded, request_app, auth_headers):
+    seeded(posts=0)
+    headers = {**auth_headers, "Idempotency-Key": "create-1"}
+    first, _ = request_app("POST", "/posts/", json={"title": "t", "content": "c"}, headers=headers)
+    replay, statements_run = request_app("POST", "/posts/", json={"title": "t", "content": "c"}, headers=headers)
+    assert replay.json() == first.json() and replay.headers["Idempotent-Replayed"] == "true"
+    assert statements_run == 0  # the user comes from the auth cache, the post from the store
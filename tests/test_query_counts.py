@@ -0,0 +1,27 @@
+"""The post detail routes run a fixed number of statements, however much they return."""
+from pagination import DEFAULT_PAGE_SIZE
+
+
+def test_get_post_statements_do_not_grow_with_comments(seeded, request_app):
+    counts = []
+    for comments_per_post in (1, DEFAULT_PAGE_SIZE * 2):
+        seeded(posts=1, comments_per_post=comments_per_post)
+        response, count = request_app("GET", "/posts/1")
+        assert response.status_code == 200
+        assert len(response.json()["comments"]) == min(comments_per_post, DEFAULT_PAGE_SIZE)
+        counts.append(count)
+    # The post with its author, then the comment page with authors; new posts skip the archive
+    assert counts == [2, 2]
+
+
+def test_get_posts_by_ids_statements_do_not_grow_with_ids(seeded, request_app):
+    seeded(posts=20, comments_per_post=3)
+    counts = []
+    for ids in ("1", "1,2,3,4,5,6,7,8,9,10"):
+        response, count = request_app("GET", "/posts/batch", params={"ids": ids})
+        assert response.status_code == 200
+        assert [post["id"] for post in response.json()] == [int(post_id) for post_id in ids.split(",")]
+        assert all(len(post["comments"]) == 3 for post in response.json())
+        counts.append(count)
+    # The posts with their authors, then every comment page in one query
+    assert counts == [2, 2]
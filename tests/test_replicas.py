@@ -0,0 +1,67 @@
+"""Reads go round-robin to the replicas, fall back to the primary, and follow a recent writer."""
+import asyncio
+import pytest
+import database
+from database import AsyncSessionLocal, Replica, engine, open_read_session
+
+
+@pytest.fixture
+def two_replicas(monkeypatch, tmp_path):
+    # As if READ_REPLICA_URLS named two SQLite files
+    urls = [f"sqlite+aiosqlite:///{tmp_path}/replica{i}.db" for i in range(2)]
+    replicas = [Replica(url) for url in urls]
+    monkeypatch.setattr(database, "READ_REPLICA_URLS", urls)
+    monkeypatch.setattr(database, "replicas", replicas)
+    monkeypatch.setattr(database, "READ_REPLICA_POLICY", "round_robin")
+    monkeypatch.setattr(database, "_recent_writers", {})
+    yield replicas
+    for replica in replicas:
+        asyncio.run(replica.engine.dispose())
+
+
+async def read_binds(count: int, writer=None) -> list:
+    binds = []
+    for _ in range(count):
+        session = await open_read_session(writer)
+        binds.append(session.bind)
+        await session.close()
+    return binds
+
+
+def test_reads_go_round_robin(two_replicas):
+    binds = asyncio.run(read_binds(4))
+    assert set(binds) == {replica.engine for replica in two_replicas}
+    assert binds[0] is binds[2] and binds[1] is binds[3] and binds[0] is not binds[1]
+
+
+def test_reads_fall_back_to_the_primary(two_replicas):
+    two_replicas[0].mark_down()
+    assert asyncio.run(read_binds(2)) == [two_replicas[1].engine] * 2
+    two_replicas[1].mark_down()
+    assert asyncio.run(read_binds(1)) == [engine]
+
+
+def test_unreachable_replica_is_marked_down(two_replicas, tmp_path, monkeypatch):
+    unreachable = Replica(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    monkeypatch.setattr(database, "replicas", [unreachable])
+    assert asyncio.run(read_binds(1)) == [engine]
+    assert not unreachable.is_up()
+    asyncio.run(unreachable.engine.dispose())
+
+
+def test_writer_reads_from_the_primary_within_the_window(two_replicas, monkeypatch):
+    writer = "Bearer writer"
+
+    async def write_then_read():
+        async with AsyncSessionLocal() as session:
+            session.info["writer"] = writer
+            await session.commit()
+        return await read_binds(2, writer), await read_binds(2, "Bearer reader")
+
+    own, other = asyncio.run(write_then_read())
+    assert own == [engine, engine]
+    assert engine not in other
+
+    # Outside the window the writer is back on the replicas
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 0)
+    assert engine not in asyncio.run(read_binds(2, writer))
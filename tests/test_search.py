@@ -0,0 +1,77 @@
+"""The in-process inverted index ranks, pages and reindexes like the Postgres search."""
+import pytest
+import search
+
+
+@pytest.fixture(autouse=True)
+def fresh_index(seeded):
+    seeded(posts=0)
+    # Seeding bypasses the commits that mark the indexes stale
+    for index in search._indexes.values():
+        index.stale = True
+
+
+def create_posts(request_app, auth_headers, contents) -> list:
+    ids = []
+    for content in contents:
+        response, _ = request_app("POST", "/posts/", json={"title": "Post", "content": content}, headers=auth_headers)
+        assert response.status_code == 200
+        ids.append(response.json()["id"])
+    return ids
+
+
+def search_ids(request_app, path, q, **params) -> list:
+    response, _ = request_app("GET", path, params={"q": q, **params})
+    assert response.status_code == 200
+    return [(item["rank"], item["id"]) for item in response.json()["items"]]
+
+
+def test_matches_are_ranked_by_term_frequency(request_app, auth_headers):
+    once, thrice, none, twice = create_posts(
+        request_app, auth_headers, ["apple pie", "apple apple apple", "banana", "Apple, apple!"]
+    )
+    assert search_ids(request_app, "/posts/search", "apple") == [(3.0, thrice), (2.0, twice), (1.0, once)]
+
+
+def test_every_term_must_match(request_app, auth_headers):
+    both, apple, pie = create_posts(request_app, auth_headers, ["apple pie", "apple tart", "cherry pie"])
+    assert search_ids(request_app, "/posts/search", "pie apple") == [(2.0, both)]
+    assert search_ids(request_app, "/posts/search", "apple kiwi") == []
+
+
+def test_cursor_pages_on_rank_then_id(request_app, auth_headers):
+    # Equal ranks straddle the page boundaries, so ties must be broken on id
+    create_posts(request_app, auth_headers, ["apple apple", "apple", "apple", "apple apple", "apple", "pear"])
+    expected = search_ids(request_app, "/posts/search", "apple", limit=100)
+    assert expected == sorted(expected, reverse=True) and len(expected) == 5
+
+    pages, cursor = [], None
+    while True:
+        params = {"q": "apple", "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response, _ = request_app("GET", "/posts/search", params=params)
+        body = response.json()
+        pages.append([(item["rank"], item["id"]) for item in body["items"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [entry for page in pages for entry in page] == expected
+
+
+def test_commits_reindex_the_rows_they_touch(request_app, auth_headers):
+    assert search_ids(request_app, "/posts/search", "banana") == []
+    (post_id,) = create_posts(request_app, auth_headers, ["banana"])
+    assert search_ids(request_app, "/posts/search", "banana") == [(1.0, post_id)]
+
+    response, _ = request_app("POST", "/comments/", json={"post_id": post_id, "content": "kiwi"}, headers=auth_headers)
+    comment_id = response.json()["id"]
+    assert search_ids(request_app, "/comments/search", "kiwi") == [(1.0, comment_id)]
+
+    request_app("PUT", f"/posts/{post_id}", json={"content": "cherry"}, headers=auth_headers)
+    assert search_ids(request_app, "/posts/search", "banana") == []
+    assert search_ids(request_app, "/posts/search", "cherry") == [(1.0, post_id)]
+
+    # The post's comments go with it
+    request_app("DELETE", f"/posts/{post_id}", headers=auth_headers)
+    assert search_ids(request_app, "/posts/search", "cherry") == []
+    assert search_ids(request_app, "/comments/search", "kiwi") == []
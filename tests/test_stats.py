@@ -0,0 +1,67 @@
+"""Deletes keep /users/{id}/stats and /posts/trending correct until the next summary refresh."""
+import asyncio
+from blog_app.stats.summaries import refresh_summaries
+from blog_app.users import dependencies
+from database import engine
+
+
+def refresh(full: bool = False) -> None:
+    async def run():
+        async with engine.connect() as conn:
+            await refresh_summaries(conn, full)
+
+    asyncio.run(run())
+
+
+def stats(request_app) -> dict:
+    return request_app("GET", "/users/1/stats")[0].json()
+
+
+def trending(request_app) -> dict:
+    body = request_app("GET", "/posts/trending")[0].json()
+    return {item["id"]: item["recent_comments"] for item in body["items"]}, body["source"]
+
+
+def test_comment_deletes_read_live_until_the_next_refresh(seeded, request_app, auth_headers):
+    seeded(posts=2, comments_per_post=2)
+    refresh(full=True)
+    assert (stats(request_app)["source"], stats(request_app)["comment_count"]) == ("summary", 4)
+    assert trending(request_app) == ({1: 2, 2: 2}, "summary")
+
+    assert request_app("DELETE", "/comments/1/", headers=auth_headers)[0].status_code == 204
+    assert request_app("DELETE", "/comments/batch", json={"ids": [3]}, headers=auth_headers)[0].status_code == 200
+    after_delete = stats(request_app)
+    assert (after_delete["source"], after_delete["comment_count"], after_delete["comments_received"]) == ("live", 2, 2)
+    assert trending(request_app) == ({1: 1, 2: 1}, "summary")
+
+    # The incremental refresh recomputes users whose row was dropped
+    refresh()
+    assert (stats(request_app)["source"], stats(request_app)["comment_count"]) == ("summary", 2)
+
+
+def test_post_deletes_read_live_until_the_next_refresh(seeded, request_app, auth_headers):
+    seeded(posts=3, comments_per_post=2)
+    refresh(full=True)
+
+    assert request_app("DELETE", "/posts/1", headers=auth_headers)[0].status_code == 200
+    assert request_app("DELETE", "/posts/batch", json={"ids": [2]}, headers=auth_headers)[0].status_code == 200
+    after_delete = stats(request_app)
+    assert (after_delete["source"], after_delete["post_count"], after_delete["comment_count"]) == ("live", 1, 2)
+    assert trending(request_app) == ({3: 2}, "summary")
+
+    refresh()
+    assert (stats(request_app)["source"], stats(request_app)["post_count"]) == ("summary", 1)
+
+
+def test_purges_mark_the_summaries_stale(seeded, request_app, auth_headers, monkeypatch):
+    monkeypatch.setattr(dependencies, "ADMIN_USERNAMES", {"author"})
+    seeded(posts=2, comments_per_post=1)
+    refresh(full=True)
+
+    response, _ = request_app("DELETE", "/posts/", params={"before": "2999-01-01T00:00:00Z"}, headers=auth_headers)
+    assert response.json()["deleted"] == 2
+    assert (stats(request_app)["source"], stats(request_app)["post_count"]) == ("live", 0)
+    assert trending(request_app) == ({}, "live")
+
+    refresh()
+    assert (stats(request_app)["source"], stats(request_app)["post_count"]) == ("summary", 0)
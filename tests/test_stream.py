@@ -0,0 +1,18 @@
+"""A subscriber that falls behind is evicted once and keeps its eviction marker."""
+import asyncio
+from blog_app.comments.stream import CommentBroker
+
+
+def test_slow_subscriber_is_evicted_once():
+    async def scenario():
+        broker = CommentBroker(queue_size=2, max_subscribers=10)
+        slow, fast = asyncio.Queue(2), asyncio.Queue(100)
+        broker.queues[1].update({slow, fast})
+        for i in range(6):
+            broker.dispatch({"post_id": 1, "event": "created", "comment_id": i})
+        return broker, slow, fast
+
+    broker, slow, fast = asyncio.run(scenario())
+    assert broker.evicted == 1
+    assert broker.queues[1] == {fast} and fast.qsize() == 6
+    assert slow.qsize() == 1 and slow.get_nowait()["event"] == "evicted"